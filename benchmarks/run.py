@@ -0,0 +1,491 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+STAGES = [
+    "load",
+    "thumbnail",
+    "thumbnail_pool",
+    "reorder",
+    "bulk_reorder",
+    "merge",
+    "merge_memory",
+    "startup",
+]
+# Stages that do not depend on the test PDF and run once
+APP_STAGES = {"startup"}
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "pypdfmerger-bench")
+
+# Higher is better for these metrics, lower is better for everything else
+HIGHER_IS_BETTER = {"pages_per_s", "ops_per_s"}
+COMPARED_METRICS = ["pages_per_s", "ops_per_s", "p50_ms", "p90_ms", "peak_rss_mb"]
+
+# Launch to a shown main window, in a fresh interpreter
+STARTUP_BUDGET_MS = 1000.0
+# Loading any of these at startup means a lazy import regressed
+HEAVY_MODULES = ("fitz", "pymupdf", "PyPDF2")
+
+
+def peak_rss_mb() -> Optional[float]:
+    # ru_maxrss carries over the peak of the parent that started this process,
+    # which has all PDF libraries loaded, so prefer the peak of this process
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50_ms": value, "p90_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": cuts[49] * 1000,
+        "p90_ms": cuts[89] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+
+
+def timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+_app: Any = None
+
+
+def get_app() -> Any:
+    global _app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+
+    # Kept alive for the whole run; Qt aborts if pixmaps outlive the app
+    if _app is None:
+        _app = QApplication.instance() or QApplication([])
+    return _app
+
+
+def page_count(path: str) -> int:
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def bench_load(path: str, repeat: int) -> dict[str, Any]:
+    get_app()
+    from PyQt6.QtGui import QIcon
+
+    from page_model import PageListModel
+    from pdf_to_icon import PdfToIcon
+
+    samples: list[float] = []
+    pages = 0
+    for _ in range(repeat):
+        model = PageListModel(QIcon())
+        worker = PdfToIcon(model, [path])
+        # Runs the worker body synchronously, so the insert is a direct call
+        samples.append(timed(worker.run))
+        pages = model.rowCount()
+    return {
+        "pages": pages,
+        "pages_per_s": pages / statistics.median(samples),
+        **percentiles(samples),
+    }
+
+
+def bench_thumbnail(path: str, sample_pages: int) -> dict[str, Any]:
+    get_app()
+    from render_pool import render_thumbnail
+    from utils import thumbnail_pixmap
+
+    count = page_count(path)
+    page_nums = list(range(min(count, sample_pages)))
+    samples = [
+        timed(lambda: thumbnail_pixmap(render_thumbnail(path, page_num)))
+        for page_num in page_nums
+    ]
+    return {
+        "pages": len(page_nums),
+        "pages_per_s": len(page_nums) / sum(samples),
+        **percentiles(samples),
+    }
+
+
+def bench_thumbnail_pool(path: str, sample_pages: int) -> dict[str, Any]:
+    from render_pool import RenderPool
+
+    count = page_count(path)
+    pages = [(path, page_num) for page_num in range(min(count, sample_pages))]
+    pool = RenderPool()
+
+    def render(batch: list[tuple[str, int]]) -> None:
+        # Submitted one by one, as the thumbnail loader does
+        futures = [pool.submit(file_path, page_num) for file_path, page_num in batch]
+        for future in futures:
+            future.result()
+
+    try:
+        # Warm up the worker processes so spawn time is not measured
+        render(pages[: pool.workers])
+        elapsed = timed(lambda: render(pages))
+    finally:
+        pool.shutdown()
+    return {
+        "pages": len(pages),
+        "workers": pool.workers,
+        "pages_per_s": len(pages) / elapsed,
+    }
+
+
+def bench_reorder(path: str, operations: int) -> dict[str, Any]:
+    get_app()
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtGui import QIcon
+
+    from document_info import inspect_document
+    from page_model import PageListModel
+
+    model = PageListModel(QIcon())
+    model.append_documents([inspect_document(path)] * 5)
+    rows = model.rowCount()
+    rng = random.Random(0)
+
+    def operation() -> None:
+        row = rng.randrange(rows - 10)
+        count = rng.randint(1, 10)
+        if rng.random() < 0.8:
+            model.move_rows_to(range(row, row + count), rng.randrange(rows))
+        else:
+            model.insert_pages(rng.randrange(rows - count), model.take_rows(row, count))
+        # A repaint relabels the visible rows
+        for visible in range(row, min(rows, row + 20)):
+            model.index(visible).data(Qt.ItemDataRole.DisplayRole)
+
+    samples = [timed(operation) for _ in range(operations)]
+    return {
+        "rows": rows,
+        "ops_per_s": operations / sum(samples),
+        **percentiles(samples),
+    }
+
+
+def bench_bulk_reorder(path: str, operations: int) -> dict[str, Any]:
+    get_app()
+    from PyQt6.QtGui import QIcon
+
+    from document_info import inspect_document
+    from page_model import PageListModel
+
+    model = PageListModel(QIcon())
+    info = inspect_document(path)
+    # A second name for the same file gives interleaving two sources to mix
+    model.append_documents([info, info._replace(file_path=path + ".copy")] * 3)
+    rows = model.rowCount()
+    rng = random.Random(0)
+
+    samples: list[float] = []
+    taken: list[tuple[str, int]] = []
+    for i in range(operations):
+        picked = rng.sample(range(rows), min(500, rows // 2))
+        if i % 5 == 0:
+            samples.append(timed(lambda: model.move_rows_to(picked, rows // 2)))
+        elif i % 5 == 1:
+            samples.append(timed(lambda: model.reverse_rows(picked)))
+        elif i % 5 == 2:
+            samples.append(timed(lambda: model.sort_rows(picked)))
+        elif i % 5 == 3:
+            samples.append(timed(lambda: model.interleave_rows(range(rows))))
+        else:
+            samples.append(timed(lambda: taken.extend(model.take_rows_at(picked))))
+            model.insert_pages(model.rowCount() // 3, taken)
+            taken.clear()
+    return {
+        "rows": rows,
+        "ops_per_s": operations / sum(samples),
+        **percentiles(samples),
+    }
+
+
+def bench_merge(path: str, repeat: int, memory_limit: Optional[int]) -> dict[str, Any]:
+    from merge import merge_pages
+
+    pages = [(path, page_num) for page_num in range(page_count(path))]
+    samples: list[float] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output = os.path.join(temp_dir, "out.pdf")
+        for _ in range(repeat):
+            samples.append(
+                timed(lambda: merge_pages(pages, output, memory_limit=memory_limit))
+            )
+        size = os.path.getsize(output)
+    return {
+        "pages": len(pages),
+        "output_mb": size / (1024 * 1024),
+        "pages_per_s": len(pages) / statistics.median(samples),
+        **percentiles(samples),
+    }
+
+
+def startup_child() -> None:
+    get_app()
+    import pypdfmerger
+
+    imported = time.perf_counter()
+    window = pypdfmerger.PyPDFMerger()
+    window.show()
+    get_app().processEvents()
+    shown = time.perf_counter()
+    loaded = [module for module in HEAVY_MODULES if module in sys.modules]
+    result = {
+        "window_ms": (shown - imported) * 1000,
+        "heavy_modules": loaded,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(json.dumps(result), flush=True)
+
+
+def bench_startup(repeat: int) -> dict[str, Any]:
+    # Every sample is a cold start, timed from launching the interpreter until
+    # the window is shown
+    samples: list[float] = []
+    children: list[dict[str, Any]] = []
+    command = [sys.executable, os.path.abspath(__file__), "--startup-child"]
+    for _ in range(max(repeat, 5)):
+        start = time.perf_counter()
+        with subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ) as child:
+            assert child.stdout is not None
+            line = child.stdout.readline()
+            samples.append(time.perf_counter() - start)
+        if not line:
+            raise RuntimeError("the application did not start")
+        children.append(json.loads(line))
+    return {
+        "window_ms": statistics.median(child["window_ms"] for child in children),
+        "heavy_modules": sorted(
+            {module for child in children for module in child["heavy_modules"]}
+        ),
+        "budget_ms": STARTUP_BUDGET_MS,
+        **percentiles(samples),
+        "peak_rss_mb": max(child["peak_rss_mb"] or 0 for child in children) or None,
+    }
+
+
+def startup_problems(result: dict[str, Any], budget_ms: float) -> list[str]:
+    problems: list[str] = []
+    if result["p50_ms"] > budget_ms:
+        problems.append(
+            f"startup takes {result['p50_ms']:.0f} ms, over the "
+            f"{budget_ms:.0f} ms budget"
+        )
+    if result["heavy_modules"]:
+        problems.append(
+            f"startup loads {', '.join(result['heavy_modules'])}, which should "
+            "load on first use"
+        )
+    return problems
+
+
+def run_stage(stage: str, path: str, args: argparse.Namespace) -> dict[str, Any]:
+    from output_profiles import DEFAULT_MEMORY_LIMIT
+
+    if stage == "load":
+        result = bench_load(path, args.repeat)
+    elif stage == "thumbnail":
+        result = bench_thumbnail(path, args.sample_pages)
+    elif stage == "thumbnail_pool":
+        result = bench_thumbnail_pool(path, args.sample_pages)
+    elif stage == "reorder":
+        result = bench_reorder(path, args.operations)
+    elif stage == "bulk_reorder":
+        result = bench_bulk_reorder(path, args.operations)
+    elif stage == "merge":
+        result = bench_merge(path, args.repeat, DEFAULT_MEMORY_LIMIT)
+    elif stage == "merge_memory":
+        result = bench_merge(path, args.repeat, None)
+    elif stage == "startup":
+        result = bench_startup(args.repeat)
+    else:
+        raise ValueError(f"unknown stage {stage}")
+    # Stages that measure other processes report their peak themselves
+    result.setdefault("peak_rss_mb", peak_rss_mb())
+    return result
+
+
+def run_isolated(stage: str, path: str, args: argparse.Namespace) -> dict[str, Any]:
+    # A fresh interpreter per stage keeps peak RSS and warm caches separate
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--single",
+        stage,
+        path,
+        "--repeat",
+        str(args.repeat),
+        "--sample-pages",
+        str(args.sample_pages),
+        "--operations",
+        str(args.operations),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def library_versions() -> dict[str, str]:
+    versions = {"python": platform.python_version()}
+    for module, attr in (("PyPDF2", "__version__"), ("fitz", "VersionBind")):
+        try:
+            versions[module] = str(getattr(__import__(module), attr))
+        except ImportError:
+            versions[module] = "missing"
+    from PyQt6.QtCore import PYQT_VERSION_STR
+
+    versions["PyQt6"] = PYQT_VERSION_STR
+    return versions
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    regressions: list[str] = []
+    for key, result in results["results"].items():
+        base = baseline["results"].get(key)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            new, old = result.get(metric), base.get(metric)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append(
+                    f"{key} {metric}: {old:.2f} -> {new:.2f} ({change:+.0%} worse)"
+                )
+    return regressions
+
+
+def print_table(results: dict[str, Any]) -> None:
+    header = f"{'benchmark':<28}{'pages/s':>10}{'ops/s':>10}{'p50 ms':>10}"
+    header += f"{'p90 ms':>10}{'p99 ms':>10}{'RSS MB':>10}"
+    print(header)
+    for key, result in results["results"].items():
+        row = f"{key:<28}"
+        for metric in (
+            "pages_per_s",
+            "ops_per_s",
+            "p50_ms",
+            "p90_ms",
+            "p99_ms",
+            "peak_rss_mb",
+        ):
+            value = result.get(metric)
+            row += f"{value:>10.1f}" if value is not None else f"{'-':>10}"
+        print(row)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="PyPDFMerger hot path benchmarks")
+    parser.add_argument("--cases", nargs="+", default=None)
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sample-pages", type=int, default=100)
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a saved JSON result")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="allowed relative slowdown before a metric counts as a regression",
+    )
+    parser.add_argument(
+        "--startup-budget",
+        type=float,
+        default=STARTUP_BUDGET_MS,
+        metavar="MS",
+        help="longest acceptable median cold start (default: %(default)s)",
+    )
+    parser.add_argument("--startup-child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--single", nargs=2, metavar=("STAGE", "PDF"), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.startup_child:
+        startup_child()
+        return 0
+    if args.single:
+        print(json.dumps(run_stage(args.single[0], args.single[1], args)))
+        return 0
+
+    from synthetic import CASES, ensure_pdfs
+
+    cases = args.cases or list(CASES)
+    paths = ensure_pdfs(args.data_dir, args.seed)
+    results: dict[str, Any] = {"versions": library_versions(), "results": {}}
+    for stage in args.stages:
+        if stage in APP_STAGES:
+            print(f"running app/{stage}...", file=sys.stderr)
+            results["results"][f"app/{stage}"] = run_isolated(stage, "-", args)
+    for case in cases:
+        for stage in args.stages:
+            if stage in APP_STAGES:
+                continue
+            print(f"running {case}/{stage}...", file=sys.stderr)
+            results["results"][f"{case}/{stage}"] = run_isolated(
+                stage, paths[case], args
+            )
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    startup = results["results"].get("app/startup")
+    problems = startup_problems(startup, args.startup_budget) if startup else []
+    for problem in problems:
+        print(f"STARTUP {problem}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against baseline.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
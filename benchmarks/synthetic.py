@@ -0,0 +1,64 @@
+import os
+import random
+
+import fitz
+
+# name -> (pages, images per page, embedded fonts per page)
+CASES: dict[str, tuple[int, int, int]] = {
+    "small": (10, 0, 0),
+    "large": (2000, 0, 0),
+    "images": (100, 3, 0),
+    "fonts": (200, 0, 6),
+}
+
+BUILTIN_FONTS = ["helv", "tiro", "cour", "hebo", "tibo", "cobo", "heit", "coit"]
+
+
+def _image(rng: random.Random, size: int) -> bytes:
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, size, size), False)
+    # Random blocks compress badly, like real scans
+    block = size // 8
+    for x in range(0, size, block):
+        for y in range(0, size, block):
+            color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            pix.set_rect(fitz.IRect(x, y, x + block, y + block), color)
+    return pix.tobytes("png")
+
+
+def build_pdf(path: str, case: str, seed: int = 0) -> None:
+    page_count, images_per_page, fonts_per_page = CASES[case]
+    rng = random.Random(seed)
+    images = [_image(rng, 600) for _ in range(images_per_page * 4)]
+    font_buffers = [fitz.Font(name).buffer for name in ("tiro", "cour", "helv")]
+
+    doc = fitz.open()
+    for page_num in range(page_count):
+        page = doc.new_page()
+        for line in range(30):
+            font = BUILTIN_FONTS[(page_num + line) % len(BUILTIN_FONTS)]
+            words = " ".join(
+                "".join(rng.choices("abcdefghijklmnop", k=rng.randint(2, 9)))
+                for _ in range(8)
+            )
+            page.insert_text((50, 60 + line * 24), words, fontname=font, fontsize=11)
+        for i in range(images_per_page):
+            rect = fitz.Rect(50 + i * 170, 600, 210 + i * 170, 760)
+            page.insert_image(rect, stream=rng.choice(images))
+        for i in range(fonts_per_page):
+            # Embedded under a new name on every page, so each page adds fonts
+            fontname = f"F{page_num}x{i}"
+            page.insert_font(fontname=fontname, fontbuffer=rng.choice(font_buffers))
+            page.insert_text((50, 780 - i * 14), fontname, fontname=fontname)
+    doc.save(path, garbage=1, deflate=True)
+    doc.close()
+
+
+def ensure_pdfs(data_dir: str, seed: int = 0) -> dict[str, str]:
+    os.makedirs(data_dir, exist_ok=True)
+    paths: dict[str, str] = {}
+    for case in CASES:
+        path = os.path.join(data_dir, f"{case}-{seed}.pdf")
+        if not os.path.exists(path):
+            build_pdf(path, case, seed)
+        paths[case] = path
+    return paths
@@ -0,0 +1,236 @@
+import argparse
+import os
+import re
+import sys
+from typing import TYPE_CHECKING, Optional
+
+import instrumentation
+from output_profiles import DEFAULT_MEMORY_LIMIT, DEFAULT_PROFILE, PROFILES
+
+if TYPE_CHECKING:
+    from merge import ReaderPool
+
+PAGE_SPEC = re.compile(r"^\d*(-\d*)?(,\d*(-\d*)?)*$")
+
+
+def parse_source(arg: str) -> tuple[str, Optional[str]]:
+    # rpartition keeps Windows drive letters such as C:\a.pdf intact
+    file_path, sep, spec = arg.rpartition(":")
+    if sep and file_path and spec and PAGE_SPEC.match(spec.replace(" ", "")):
+        return file_path, spec.replace(" ", "")
+    return arg, None
+
+
+def parse_page_spec(spec: str, page_count: int) -> list[int]:
+    pages: list[int] = []
+    for part in spec.split(","):
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        start = int(first) if first else 1
+        end = (int(last) if last else page_count) if sep else start
+        if not 1 <= start <= end <= page_count:
+            raise ValueError(f"page range {part} is outside 1-{page_count}")
+        pages.extend(range(start - 1, end))
+    return pages
+
+
+def collect_pages(sources: list[str], readers: "ReaderPool") -> list[tuple[str, int]]:
+    pages: list[tuple[str, int]] = []
+    for source in sources:
+        file_path, spec = parse_source(source)
+        page_count = len(readers.get(file_path).pages)
+        if spec is None:
+            page_nums = list(range(page_count))
+        else:
+            try:
+                page_nums = parse_page_spec(spec, page_count)
+            except ValueError as e:
+                raise ValueError(f"{file_path}: {e}") from None
+        pages.extend((file_path, page_num) for page_num in page_nums)
+    return pages
+
+
+def merge_command(args: argparse.Namespace) -> int:
+    # PyPDF2 only loads for a command, so --help and argument errors are quick
+    from PyPDF2.errors import DependencyError, PyPdfError
+
+    from merge import ReaderPool, merge_pages
+
+    try:
+        with ReaderPool() as readers:
+            pages = collect_pages(args.sources, readers)
+            if not pages:
+                print("error: no pages selected", file=sys.stderr)
+                return 1
+            memory_limit = args.memory_limit * 1024 * 1024 or None
+            appended = merge_pages(
+                pages,
+                args.output,
+                readers,
+                memory_limit,
+                deduplicate=args.deduplicate,
+                profile=PROFILES[args.output_profile],
+                incremental=args.incremental,
+            )
+    except (OSError, PyPdfError, DependencyError, ValueError, RuntimeError) as e:
+        # DependencyError is not a PyPdfError; it reports encryptions such as
+        # AES that need an optional package to read.
+        # RuntimeError covers MuPDF failures while applying an output profile
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    if args.quiet:
+        pass
+    elif appended:
+        print(f"Appended pages to {args.output}, which now has {len(pages)} pages")
+    else:
+        print(f"Wrote {len(pages)} pages to {args.output}")
+    return 0
+
+
+def split_command(args: argparse.Namespace) -> int:
+    from PyPDF2.errors import DependencyError, PyPdfError
+
+    from merge import ReaderPool
+    from split_export import export_pages, split_by_source, split_into_chunks
+
+    try:
+        with ReaderPool() as readers:
+            pages = collect_pages(args.sources, readers)
+        if not pages:
+            print("error: no pages selected", file=sys.stderr)
+            return 1
+        if args.chunk_size is None:
+            jobs = split_by_source(pages, args.output_dir)
+        else:
+            prefix = args.prefix or os.path.splitext(os.path.basename(pages[0][0]))[0]
+            jobs = split_into_chunks(pages, args.output_dir, prefix, args.chunk_size)
+        os.makedirs(args.output_dir, exist_ok=True)
+        export_pages(
+            jobs,
+            args.memory_limit * 1024 * 1024 or None,
+            deduplicate=args.deduplicate,
+            workers=args.workers,
+        )
+    except (OSError, PyPdfError, DependencyError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        print(f"Wrote {len(pages)} pages to {len(jobs)} files in {args.output_dir}")
+    return 0
+
+
+def _add_writer_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--memory-limit",
+        type=int,
+        default=DEFAULT_MEMORY_LIMIT // (1024 * 1024),
+        metavar="MB",
+        help="memory ceiling for cached source objects while streaming the "
+        "output; 0 builds the whole document in memory (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--deduplicate",
+        action="store_true",
+        help="write identical fonts, images and other resources only once",
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pypdfmerger",
+        description="Merge PDF files. Starts the GUI when run without a command.",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="append timings and counters as JSON lines to FILE "
+        f"(same as setting {instrumentation.METRICS_ENV})",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="write a cProfile dump of the main thread to FILE on exit "
+        f"(same as setting {instrumentation.PROFILE_ENV})",
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    merge_parser = commands.add_parser(
+        "merge",
+        help="merge pages into a new PDF without starting the GUI",
+        description="Each source is FILE or FILE:PAGES, where PAGES is a "
+        "comma-separated list of 1-based pages and ranges, e.g. a.pdf:1-5 "
+        "b.pdf:3,7 c.pdf:10-",
+    )
+    merge_parser.add_argument("sources", nargs="+", metavar="SOURCE")
+    merge_parser.add_argument("-o", "--output", required=True)
+    _add_writer_options(merge_parser)
+    merge_parser.add_argument(
+        "--output-profile",
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="archive-lossless packs objects and compresses streams; email also "
+        "downsamples high resolution images (default: %(default)s)",
+    )
+    merge_parser.add_argument(
+        "--no-incremental",
+        dest="incremental",
+        action="store_false",
+        help="always rewrite the output, even when the sources are the existing "
+        "output followed by new pages",
+    )
+    merge_parser.add_argument("-q", "--quiet", action="store_true")
+    merge_parser.set_defaults(handler=merge_command)
+
+    split_parser = commands.add_parser(
+        "split",
+        help="write the selected pages to several PDFs without starting the GUI",
+        description="Sources are given as for merge. By default every source "
+        "gets its own file, named after it; --chunk-size writes the pages in "
+        "order to PREFIX-001.pdf, PREFIX-002.pdf and so on instead. Files are "
+        "written in parallel worker processes.",
+    )
+    split_parser.add_argument("sources", nargs="+", metavar="SOURCE")
+    split_parser.add_argument(
+        "-o", "--output-dir", required=True, metavar="DIR", help="created if missing"
+    )
+    split_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        metavar="PAGES",
+        help="pages per file; 1 writes every page to its own file",
+    )
+    split_parser.add_argument(
+        "--prefix",
+        help="file name prefix for --chunk-size (default: the first source's name)",
+    )
+    split_parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="worker processes (default: one per CPU core)",
+    )
+    _add_writer_options(split_parser)
+    split_parser.add_argument("-q", "--quiet", action="store_true")
+    split_parser.set_defaults(handler=split_command)
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.metrics or args.profile:
+        instrumentation.enable(args.metrics, args.profile)
+    if args.command is None:
+        # Only the GUI pulls in PyQt6
+        from pypdfmerger import main as gui_main
+
+        gui_main()
+        return 0
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+from typing import BinaryIO, NamedTuple, cast
+
+import instrumentation
+from document_pool import shared_pool
+from thumbnail_cache import file_fingerprint
+
+
+class DocumentInfo(NamedTuple):
+    file_path: str
+    fingerprint: str
+    # Displayed page size in points, with the page rotation already applied
+    page_sizes: list[tuple[float, float]]
+    rotations: list[int]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_sizes)
+
+
+def inspect_document(file_path: str) -> DocumentInfo:
+    # Taken before opening, so a file rewritten meanwhile looks changed later
+    fingerprint = file_fingerprint(file_path)
+    with (
+        instrumentation.timer("load.inspect"),
+        shared_pool.open(file_path) as source,
+        source.document() as doc,
+    ):
+        if doc.needs_pass:
+            raise ValueError("the document is password protected")
+        if doc.is_repaired:
+            # MuPDF silently repairs files that the merge step cannot read,
+            # so those have to pass PyPDF2 as well
+            from PyPDF2 import PdfReader
+
+            with source.stream() as stream:
+                # A mapping reads and seeks like the binary file PyPDF2 expects
+                len(PdfReader(cast(BinaryIO, stream)).pages)
+        page_sizes: list[tuple[float, float]] = []
+        rotations: list[int] = []
+        for page in doc:
+            page_sizes.append((page.rect.width, page.rect.height))
+            rotations.append(page.rotation)
+    instrumentation.count("reader.opens")
+    return DocumentInfo(file_path, fingerprint, page_sizes, rotations)
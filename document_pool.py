@@ -0,0 +1,186 @@
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Generator, Optional
+
+import instrumentation
+
+if TYPE_CHECKING:
+    import fitz
+
+# Sources kept mapped while nothing uses them; ones in use are never closed
+MAX_OPEN_SOURCES = 16
+# Open files cannot be renamed, replaced or deleted on Windows, so sources are
+# not kept longer than this after their last use
+IDLE_SECONDS = 2.0
+
+
+# An open source file and its read-only memory mapping. PyMuPDF reads the
+# mapping directly and every PyPDF2 reader gets a mapping of the same handle,
+# so all of them share the same cached pages and the file, or the network
+# share it is on, is read only once. Other processes mapping the file share
+# those pages through the OS cache too.
+class SourceFile:
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            stat = os.fstat(self._file.fileno())
+            if stat.st_size == 0:
+                raise ValueError("the file is empty")
+            self._mapping = self.stream()
+        except Exception:
+            self._file.close()
+            raise
+        self._stat = (stat.st_size, stat.st_mtime_ns)
+        self._view: Optional[memoryview] = None
+        self._document: Optional["fitz.Document"] = None
+        self._document_lock = threading.Lock()
+        self.refs = 0
+        self.idle_since = 0.0
+        instrumentation.count("pool.maps")
+        instrumentation.count("pool.mapped_bytes", stat.st_size)
+
+    def is_current(self) -> bool:
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == self._stat
+
+    @contextmanager
+    def document(self) -> Generator["fitz.Document", None, None]:
+        # Shared by everyone holding the source, and like any MuPDF document
+        # used by one thread at a time; others wait until it is handed back
+        with self._document_lock:
+            if self._document is None:
+                # Merging alone does not need MuPDF
+                import fitz
+
+                self._view = memoryview(self._mapping)
+                self._document = fitz.open(stream=self._view, filetype="pdf")
+                instrumentation.count("render.document_opens")
+            yield self._document
+
+    def stream(self) -> mmap.mmap:
+        # Each caller gets its own file position; close it when done
+        return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        self._mapping.close()
+        self._file.close()
+
+
+class DocumentPool:
+    def __init__(
+        self, max_open: int = MAX_OPEN_SOURCES, idle_seconds: float = IDLE_SECONDS
+    ) -> None:
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._sources: OrderedDict[str, SourceFile] = OrderedDict()
+        self._idle_timer: Optional[threading.Timer] = None
+
+    def acquire(self, file_path: str) -> SourceFile:
+        with self._lock:
+            source = self._sources.get(file_path)
+            if source is not None and not source.is_current():
+                # Whoever still holds the old mapping keeps reading the old file
+                del self._sources[file_path]
+                if source.refs == 0:
+                    source.close()
+                source = None
+            if source is None:
+                source = SourceFile(file_path)
+                self._sources[file_path] = source
+            else:
+                self._sources.move_to_end(file_path)
+                instrumentation.count("pool.reuses")
+            source.refs += 1
+            self._close_idle()
+        return source
+
+    def release(self, source: SourceFile) -> None:
+        with self._lock:
+            source.refs -= 1
+            if source.refs == 0:
+                if self._sources.get(source.file_path) is not source:
+                    source.close()
+                else:
+                    source.idle_since = time.monotonic()
+                    self._schedule_idle_check()
+            self._close_idle()
+
+    def discard(self, file_path: str) -> None:
+        # Closes file_path right away unless it is in use, for example before
+        # the file is replaced
+        with self._lock:
+            source = self._sources.get(file_path)
+            if source is not None and source.refs == 0:
+                del self._sources[file_path]
+                source.close()
+
+    @contextmanager
+    def open(self, file_path: str) -> Generator[SourceFile, None, None]:
+        source = self.acquire(file_path)
+        try:
+            yield source
+        finally:
+            self.release(source)
+
+    def _schedule_idle_check(self) -> None:
+        if self._idle_timer is not None:
+            return
+        idle = [
+            source.idle_since for source in self._sources.values() if not source.refs
+        ]
+        if idle:
+            delay = min(idle) + self.idle_seconds - time.monotonic()
+            self._idle_timer = threading.Timer(max(0.0, delay), self._close_expired)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _close_expired(self) -> None:
+        with self._lock:
+            self._idle_timer = None
+            expired = time.monotonic() - self.idle_seconds
+            for file_path, source in list(self._sources.items()):
+                if source.refs == 0 and source.idle_since <= expired:
+                    del self._sources[file_path]
+                    source.close()
+            self._schedule_idle_check()
+
+    def _close_idle(self) -> None:
+        # Least recently used first
+        excess = len(self._sources) - self.max_open
+        for file_path, source in list(self._sources.items()):
+            if excess <= 0:
+                break
+            if source.refs == 0:
+                del self._sources[file_path]
+                source.close()
+                excess -= 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            for file_path, source in list(self._sources.items()):
+                if source.refs == 0:
+                    del self._sources[file_path]
+                    source.close()
+
+
+# Every process has its own pool: the GUI for inspecting and merging, each
+# render worker for its thumbnails
+shared_pool = DocumentPool()
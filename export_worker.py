@@ -0,0 +1,31 @@
+from typing import Optional
+
+from merge_worker import WriteWorker
+from split_export import ExportJob, export_pages
+
+
+class ExportWorker(WriteWorker):
+    def __init__(
+        self,
+        jobs: list[ExportJob],
+        memory_limit: Optional[int],
+        fingerprints: Optional[dict[str, str]] = None,
+        deduplicate: bool = False,
+        workers: Optional[int] = None,
+    ):
+        super().__init__()
+        self.jobs = jobs
+        self.memory_limit = memory_limit
+        self.fingerprints = fingerprints
+        self.deduplicate = deduplicate
+        self.workers = workers
+
+    def _write(self) -> None:
+        export_pages(
+            self.jobs,
+            self.memory_limit,
+            self._report_progress,
+            self.fingerprints,
+            self.deduplicate,
+            self.workers,
+        )
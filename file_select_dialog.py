@@ -27,11 +27,15 @@ class FileSelectDialog(QDialog):
         add_button = QPushButton("Add Files")
         add_button.clicked.connect(self._add_files)
 
+        add_folder_button = QPushButton("Add Folder")
+        add_folder_button.clicked.connect(self._add_folder)
+
         ok_button = QPushButton("OK")
         ok_button.clicked.connect(self.accept)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(add_button)
+        button_layout.addWidget(add_folder_button)
         button_layout.addWidget(ok_button)
 
         layout = QVBoxLayout()
@@ -66,6 +70,20 @@ class FileSelectDialog(QDialog):
             item.setData(Qt.ItemDataRole.UserRole, file_path)
             self.file_list.addItem(item)
 
+    def _add_folder(self) -> None:
+        folder = QFileDialog.getExistingDirectory(
+            self, "Select Folder", self._get_last_directory()
+        )
+        if not folder:
+            return
+
+        self.settings.setValue("lastDirectory", folder)
+
+        # Searched for PDFs, including subfolders, when the files are loaded
+        item = QListWidgetItem(os.path.basename(folder) + "/")
+        item.setData(Qt.ItemDataRole.UserRole, folder)
+        self.file_list.addItem(item)
+
     def get_selected_files(self) -> list[str]:
         files: list[str] = []
         for i in range(self.file_list.count()):
@@ -0,0 +1,79 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Generator, Iterable, Iterator, Optional
+
+# Checking files is mostly waiting for the disk or network share
+SCAN_WORKERS = 8
+# Files checked ahead of the one the caller is waiting for
+SCAN_WINDOW = 64
+
+_DIGITS = re.compile(r"(\d+)")
+
+
+def natural_key(name: str) -> list[object]:
+    # "scan2.pdf" sorts before "scan10.pdf"
+    return [
+        int(part) if part.isdigit() else part.lower() for part in _DIGITS.split(name)
+    ]
+
+
+def find_pdfs(
+    paths: Iterable[str], workers: int = SCAN_WORKERS
+) -> Generator[tuple[str, Optional[str]], None, None]:
+    # Yields every file with the reason it cannot be loaded, or None. Folders
+    # are searched recursively for .pdf files in natural order; other paths
+    # are taken as given. Files are checked in parallel but yielded in order
+    # as soon as they are checked, so loading can start right away.
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending: deque[tuple[str, Future[Optional[str]]]] = deque()
+    try:
+        for file_path in _walk(paths):
+            pending.append((file_path, executor.submit(_check_pdf, file_path)))
+            if len(pending) >= SCAN_WINDOW:
+                file_path, future = pending.popleft()
+                yield file_path, future.result()
+        while pending:
+            file_path, future = pending.popleft()
+            yield file_path, future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _walk(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _walk_folder(path)
+        else:
+            yield path
+
+
+def _walk_folder(folder: str) -> Iterator[str]:
+    try:
+        with os.scandir(folder) as it:
+            entries = sorted(it, key=lambda entry: natural_key(entry.name))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_folder(entry.path)
+            elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                yield entry.path
+        except OSError:
+            continue
+
+
+def _check_pdf(file_path: str) -> Optional[str]:
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(1024)
+    except OSError as e:
+        return str(e)
+    if not head:
+        return "the file is empty"
+    # The header may follow some junk, as long as it is in the first 1 KB
+    if b"%PDF-" not in head:
+        return "not a PDF file"
+    return None
@@ -0,0 +1,135 @@
+import atexit
+import cProfile
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Generator, Optional
+
+METRICS_ENV = "PYPDFMERGER_METRICS"
+PROFILE_ENV = "PYPDFMERGER_PROFILE"
+
+_lock = threading.Lock()
+_counters: dict[str, int] = {}
+_timers: dict[str, array] = {}
+_metrics_path: Optional[str] = None
+_profile_path: Optional[str] = None
+_profiler: Optional[cProfile.Profile] = None
+_registered = False
+_started = time.time()
+_started_clock = time.perf_counter()
+
+
+def enable(metrics_path: Optional[str], profile_path: Optional[str] = None) -> None:
+    global _metrics_path, _profile_path, _profiler, _registered
+    if not _registered:
+        atexit.register(write)
+        _registered = True
+    if metrics_path:
+        _metrics_path = os.path.abspath(metrics_path)
+        # Render workers are separate processes and enable themselves on import
+        os.environ[METRICS_ENV] = _metrics_path
+
+    if profile_path and _profiler is None:
+        _profile_path = os.path.abspath(profile_path)
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def count(name: str, value: int = 1) -> None:
+    if _metrics_path is None:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def add_time(name: str, seconds: float) -> None:
+    if _metrics_path is None:
+        return
+    with _lock:
+        samples = _timers.get(name)
+        if samples is None:
+            samples = _timers[name] = array("d")
+        samples.append(seconds)
+
+
+@contextmanager
+def timer(name: str) -> Generator[None, None, None]:
+    if _metrics_path is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+def mark(name: str) -> None:
+    # Time from when the process loaded this module until now, for milestones
+    # such as the main window showing up; entry points import it first
+    add_time(name, time.perf_counter() - _started_clock)
+
+
+def _summarize(samples: array) -> dict[str, float]:
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+    return {
+        "count": len(ordered),
+        "total_ms": sum(ordered) * 1000,
+        "mean_ms": sum(ordered) * 1000 / len(ordered),
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def snapshot() -> dict[str, object]:
+    with _lock:
+        counters = dict(_counters)
+        timers = {name: _summarize(samples) for name, samples in _timers.items()}
+    return {
+        "pid": os.getpid(),
+        "process": "main" if multiprocessing.parent_process() is None else "worker",
+        "argv": sys.argv,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_started)),
+        "duration_s": time.time() - _started,
+        "counters": counters,
+        "timers": timers,
+    }
+
+
+def write() -> None:
+    global _profiler
+    if _profiler is not None and _profile_path is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profile_path)
+        _profiler = None
+    if _metrics_path is None:
+        return
+
+    record = snapshot()
+    if not record["counters"] and not record["timers"]:
+        return
+    # One JSON line per process, so render workers can append to the same file
+    try:
+        with open(_metrics_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Could not write metrics to {_metrics_path}: {e}", file=sys.stderr)
+
+
+# Only the main process profiles; workers would overwrite its dump
+_env_profile_path = (
+    os.environ.get(PROFILE_ENV) if multiprocessing.parent_process() is None else None
+)
+if os.environ.get(METRICS_ENV) or _env_profile_path:
+    enable(os.environ.get(METRICS_ENV), _env_profile_path)
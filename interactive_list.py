@@ -4,8 +4,8 @@ import sys
 from typing import TYPE_CHECKING, Optional
 
 from PyQt6.QtCore import (
-    QEasingCurve,
-    QPropertyAnimation,
+    QItemSelection,
+    QItemSelectionModel,
     QRect,
     QSize,
     Qt,
@@ -22,13 +22,15 @@ from PyQt6.QtGui import (
     QPixmap,
     QColor,
 )
-from PyQt6.QtWidgets import QAbstractItemView, QListWidget, QListWidgetItem, QWidget, QGraphicsOpacityEffect
+from PyQt6.QtWidgets import QAbstractItemView, QListView, QWidget
+
+from page_model import ROWS_MIME_TYPE, PageListModel, make_placeholder_icon
 
 if TYPE_CHECKING:
     from pypdfmerger import PyPDFMerger
 
 
-class InteractiveQListDragAndDrop(QListWidget):
+class InteractiveQListDragAndDrop(QListView):
     def __init__(
         self,
         parent: Optional[QWidget] = None,
@@ -37,20 +39,33 @@ class InteractiveQListDragAndDrop(QListWidget):
         super().__init__(parent)
         self.main_window = main_window
         self._drop_indicator_row = -1
-        self._animations: list[QPropertyAnimation] = []
 
         self.setDragEnabled(True)
         self.setAcceptDrops(True)
         self.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
-        self.setMovement(QListWidget.Movement.Snap)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setMovement(QListView.Movement.Snap)
         self.setIconSize(QSize(140, 140))
-        self.setResizeMode(QListWidget.ResizeMode.Adjust)
+        # Lets Qt lay out thousands of rows without measuring each one
+        self.setUniformItemSizes(True)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
         self.setDropIndicatorShown(False)
         self.setSpacing(4)
         self.setDefaultDropAction(Qt.DropAction.MoveAction)
 
+        self.page_model = PageListModel(
+            make_placeholder_icon(self.iconSize()),
+            self,
+            main_window.page_rasters if main_window else None,
+            make_placeholder_icon(self.iconSize(), failed=True),
+        )
+        self.setModel(self.page_model)
+
         self._load_empty_state_pixmap()
 
+    def count(self) -> int:
+        return self.page_model.rowCount()
+
     def _load_empty_state_pixmap(self) -> None:
         if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
             bundle_dir = sys._MEIPASS
@@ -149,6 +164,7 @@ class InteractiveQListDragAndDrop(QListWidget):
         if e is None:
             return
 
+        drop_row = self._drop_indicator_row
         self._drop_indicator_row = -1
         viewport = self.viewport()
         if viewport:
@@ -156,51 +172,48 @@ class InteractiveQListDragAndDrop(QListWidget):
 
         mime_data = e.mimeData()
         if mime_data and mime_data.hasUrls():
+            # Dropped folders are searched for PDFs while loading
             pdf_files = [
                 url.toLocalFile()
                 for url in mime_data.urls()
                 if url.toLocalFile().lower().endswith(".pdf")
+                or os.path.isdir(url.toLocalFile())
             ]
             if pdf_files and self.main_window:
                 self.main_window.upload_pdfs(pdf_files)
+        elif mime_data and mime_data.hasFormat(ROWS_MIME_TYPE) and e.source() == self:
+            data = mime_data.data(ROWS_MIME_TYPE).data()
+            rows = [int(row) for row in data.split(b",")]
+            if drop_row < 0:
+                drop_row = self.count()
+            # All dragged pages land where the indicator was, in one move
+            moved = self.page_model.move_rows_to(rows, drop_row)
+            self.select_rows(moved)
+            # The move is done; keep the view from removing the dragged rows
+            e.setDropAction(Qt.DropAction.CopyAction)
+            e.accept()
         else:
-            source_row = self.currentRow()
-            drop_index = self.indexAt(e.position().toPoint())
-
-            if drop_index.isValid() and e.source() == self:
-                target_row = drop_index.row()
-                if source_row != target_row:
-                    item = self.takeItem(source_row)
-                    if item:
-                        if source_row < target_row:
-                            target_row -= 1
-                        self.insertItem(target_row, item)
-                        self.setCurrentItem(item)
-                        self._animate_item(target_row)
-            else:
-                super().dropEvent(e)
-
-    def _animate_item(self, row: int) -> None:
-        item = self.item(row)
-        if not item:
-            return
+            super().dropEvent(e)
 
-        widget = self.itemWidget(item)
-        if widget:
-            effect = QGraphicsOpacityEffect(widget)
-            widget.setGraphicsEffect(effect)
+    def selected_rows(self) -> list[int]:
+        selection_model = self.selectionModel()
+        if not selection_model:
+            return []
+        return sorted(index.row() for index in selection_model.selectedIndexes())
 
-            anim = QPropertyAnimation(effect, b"opacity")
-            anim.setDuration(200)
-            anim.setStartValue(0.3)
-            anim.setEndValue(1.0)
-            anim.setEasingCurve(QEasingCurve.Type.OutCubic)
-            anim.start()
-            self._animations.append(anim)
-
-        viewport = self.viewport()
-        if viewport:
-            viewport.update()
+    def select_rows(self, rows: range) -> None:
+        selection_model = self.selectionModel()
+        if not selection_model or not rows:
+            return
+        selection = QItemSelection(
+            self.page_model.index(rows[0]), self.page_model.index(rows[-1])
+        )
+        selection_model.select(
+            selection, QItemSelectionModel.SelectionFlag.ClearAndSelect
+        )
+        selection_model.setCurrentIndex(
+            self.page_model.index(rows[0]), QItemSelectionModel.SelectionFlag.NoUpdate
+        )
 
     def paintEvent(self, e: Optional[QPaintEvent]) -> None:
         super().paintEvent(e)
@@ -0,0 +1,284 @@
+import mmap
+import os
+import re
+import uuid
+from types import TracebackType
+from typing import BinaryIO, Callable, Iterable, Optional, cast
+
+from PyPDF2 import PdfReader, PdfWriter
+
+import instrumentation
+from document_pool import DocumentPool, SourceFile, shared_pool
+from output_profiles import DEFAULT_MEMORY_LIMIT, OutputProfile
+from stream_writer import IncrementalPdfWriter, StreamingPdfWriter
+from thumbnail_cache import file_fingerprint
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
+
+
+class MergeCanceled(Exception):
+    pass
+
+
+class ReaderPool:
+    # Readers read from the shared mapping of each source, which thumbnails
+    # or the pages' inspection may have mapped moments ago
+    def __init__(self, document_pool: DocumentPool = shared_pool) -> None:
+        self.document_pool = document_pool
+        self._sources: dict[str, SourceFile] = {}
+        self._streams: dict[str, mmap.mmap] = {}
+        self._readers: dict[str, PdfReader] = {}
+
+    def get(self, file_path: str) -> PdfReader:
+        reader = self._readers.get(file_path)
+        if reader is None:
+            source = self.document_pool.acquire(file_path)
+            stream = source.stream()
+            try:
+                # A mapping reads and seeks like the binary file PyPDF2 expects
+                reader = PdfReader(cast(BinaryIO, stream))
+            except Exception:
+                stream.close()
+                self.document_pool.release(source)
+                raise
+            self._sources[file_path] = source
+            self._streams[file_path] = stream
+            self._readers[file_path] = reader
+            instrumentation.count("reader.opens")
+        return reader
+
+    def __len__(self) -> int:
+        return len(self._readers)
+
+    def discard(self, file_path: str) -> None:
+        # Closes the reader of file_path and the file itself, unless others
+        # still use it
+        self._readers.pop(file_path, None)
+        stream = self._streams.pop(file_path, None)
+        if stream is not None:
+            stream.close()
+        source = self._sources.pop(file_path, None)
+        if source is not None:
+            self.document_pool.release(source)
+        self.document_pool.discard(file_path)
+
+    def close(self) -> None:
+        self._readers.clear()
+        for stream in self._streams.values():
+            stream.close()
+        self._streams.clear()
+        for source in self._sources.values():
+            self.document_pool.release(source)
+        self._sources.clear()
+
+    def __enter__(self) -> "ReaderPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+def merge_pages(
+    pages: Iterable[tuple[str, int]],
+    output_path: str,
+    readers: Optional[ReaderPool] = None,
+    memory_limit: Optional[int] = DEFAULT_MEMORY_LIMIT,
+    progress: Optional[Callable[[int, int], None]] = None,
+    fingerprints: Optional[dict[str, str]] = None,
+    deduplicate: bool = False,
+    profile: Optional[OutputProfile] = None,
+    incremental: bool = True,
+) -> bool:
+    # memory_limit=None keeps all source objects in memory; unless deduplicate
+    # is set, the document is then built with PyPDF2's PdfWriter instead.
+    # progress is called after every page and may raise MergeCanceled.
+    # fingerprints maps source files to their state when the pages were picked.
+    # With incremental, pages added after the unchanged pages of the existing
+    # output are appended to it; returns whether that happened.
+    if readers is None:
+        with ReaderPool() as readers:
+            return merge_pages(
+                pages,
+                output_path,
+                readers,
+                memory_limit,
+                progress,
+                fingerprints,
+                deduplicate,
+                profile,
+                incremental,
+            )
+
+    pages = list(pages)
+    check_fingerprints(pages, fingerprints)
+    if incremental and (profile is None or not profile.rewrites_output):
+        append_base = _append_base(pages, output_path, readers)
+        if append_base is not None:
+            base, startxref = append_base
+            _append_pages(
+                pages,
+                output_path,
+                base,
+                startxref,
+                readers,
+                memory_limit,
+                progress,
+                deduplicate,
+            )
+            return True
+
+    # Write next to the target and rename, so a failed or canceled merge
+    # never leaves a truncated file behind or clobbers the previous one
+    temp_paths = [_temp_path(output_path)]
+    try:
+        with open(temp_paths[0], "xb") as f, instrumentation.timer("merge.write"):
+            _write_pages(pages, f, readers, memory_limit, progress, deduplicate)
+            instrumentation.count("merge.pages", len(pages))
+            instrumentation.count("merge.bytes_written", f.tell())
+        if profile is not None and profile.rewrites_output:
+            # Only profiles that rewrite the output need MuPDF
+            from profile_writer import apply_profile
+
+            temp_paths.append(_temp_path(output_path))
+            apply_profile(temp_paths[0], temp_paths[1], profile, progress)
+        # Windows cannot replace a file that is open, which the output is when
+        # it is one of the sources as well
+        for file_path in {p for p, _ in pages} | {output_path}:
+            if same_file(file_path, output_path):
+                readers.discard(file_path)
+        os.replace(temp_paths[-1], output_path)
+    finally:
+        for temp_path in temp_paths:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+    return False
+
+
+def check_fingerprints(
+    pages: list[tuple[str, int]], fingerprints: Optional[dict[str, str]]
+) -> None:
+    used = {file_path for file_path, _ in pages}
+    for file_path, fingerprint in (fingerprints or {}).items():
+        if file_path in used and file_fingerprint(file_path) != fingerprint:
+            # Page numbers picked from the old file may no longer match
+            raise ValueError(
+                f"{os.path.basename(file_path)} changed on disk since it was added"
+            )
+
+
+def same_file(path: str, other: str) -> bool:
+    return os.path.normcase(os.path.realpath(path)) == os.path.normcase(
+        os.path.realpath(other)
+    )
+
+
+def _append_base(
+    pages: list[tuple[str, int]], output_path: str, readers: ReaderPool
+) -> Optional[tuple[PdfReader, int]]:
+    # The existing output and where its last cross-reference section starts,
+    # if the pages are all of its pages, in order, followed by new ones
+    if not os.path.isfile(output_path):
+        return None
+    is_output = {path: same_file(path, output_path) for path in {p for p, _ in pages}}
+    count = 0
+    while count < len(pages) and is_output[pages[count][0]]:
+        if pages[count][1] != count:
+            return None
+        count += 1
+    if count == 0 or count == len(pages):
+        return None
+    base = readers.get(pages[0][0])
+    if base.is_encrypted or len(base.pages) != count:
+        return None
+
+    with open(output_path, "rb") as f:
+        length = f.seek(0, os.SEEK_END)
+        f.seek(max(0, length - 1024))
+        match = _STARTXREF.search(f.read())
+        if match is None:
+            return None
+        startxref = int(match.group(1))
+        f.seek(startxref)
+        head = f.read(32)
+    # Files PyPDF2 could only read by searching for their objects get rewritten
+    if not head.startswith(b"xref") and re.match(rb"\d+\s+\d+\s+obj", head) is None:
+        return None
+    return base, startxref
+
+
+def _append_pages(
+    pages: list[tuple[str, int]],
+    output_path: str,
+    base: PdfReader,
+    startxref: int,
+    readers: ReaderPool,
+    memory_limit: Optional[int],
+    progress: Optional[Callable[[int, int], None]],
+    deduplicate: bool,
+) -> None:
+    new_pages = pages[len(base.pages) :]
+    is_output = {
+        path: same_file(path, output_path) for path in {p for p, _ in new_pages}
+    }
+
+    def reader_for(file_path: str) -> PdfReader:
+        # Pages taken from the output again must come from the same reader
+        return base if is_output[file_path] else readers.get(file_path)
+
+    with open(output_path, "r+b") as f, instrumentation.timer("merge.write"):
+        length = f.seek(0, os.SEEK_END)
+        try:
+            writer = IncrementalPdfWriter(
+                f, base, length, startxref, memory_limit, deduplicate
+            )
+            for file_path, page_num in new_pages:
+                writer.reserve_page(reader_for(file_path), page_num)
+            for i, (file_path, page_num) in enumerate(new_pages):
+                writer.add_page(reader_for(file_path), page_num)
+                if progress:
+                    progress(i + 1, len(new_pages))
+            writer.close()
+        except BaseException:
+            # Cut the unfinished update off, leaving the original as it was
+            f.truncate(length)
+            raise
+        instrumentation.count("merge.pages", len(new_pages))
+        instrumentation.count("merge.bytes_written", f.tell() - length)
+
+
+def _temp_path(output_path: str) -> str:
+    return f"{output_path}.{uuid.uuid4().hex[:8]}.part"
+
+
+def _write_pages(
+    pages: list[tuple[str, int]],
+    f: BinaryIO,
+    readers: ReaderPool,
+    memory_limit: Optional[int],
+    progress: Optional[Callable[[int, int], None]],
+    deduplicate: bool,
+) -> None:
+    if memory_limit is None and not deduplicate:
+        writer = PdfWriter()
+        for i, (file_path, page_num) in enumerate(pages):
+            writer.add_page(readers.get(file_path).pages[page_num])
+            if progress:
+                progress(i + 1, len(pages))
+        writer.write(f)
+        return
+
+    stream_writer = StreamingPdfWriter(f, memory_limit, deduplicate)
+    for file_path, page_num in pages:
+        stream_writer.reserve_page(readers.get(file_path), page_num)
+    for i, (file_path, page_num) in enumerate(pages):
+        stream_writer.add_page(readers.get(file_path), page_num)
+        if progress:
+            progress(i + 1, len(pages))
+    stream_writer.close()
@@ -0,0 +1,79 @@
+from abc import ABCMeta, abstractmethod
+from typing import Optional
+
+from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.sip import wrappertype
+
+from merge import MergeCanceled, merge_pages
+from output_profiles import OutputProfile
+
+
+# Qt classes are built by sip's metaclass, so abstract methods need one that
+# derives from both
+class _WriteWorkerMeta(wrappertype, ABCMeta):
+    pass
+
+
+# Writes PDF files in the background. Cancellation is requested with
+# requestInterruption and takes effect at the next progress report.
+class WriteWorker(QThread, metaclass=_WriteWorkerMeta):
+    finished = pyqtSignal()
+    progress = pyqtSignal(int, int)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.canceled = False
+        self.error: Optional[str] = None
+
+    def _report_progress(self, done: int, total: int) -> None:
+        if self.isInterruptionRequested():
+            raise MergeCanceled()
+        self.progress.emit(done, total)
+
+    def run(self) -> None:
+        try:
+            self._write()
+        except MergeCanceled:
+            self.canceled = True
+        except Exception as e:
+            # Covers I/O errors as well as sources that changed or broke
+            self.error = str(e)
+
+        self.finished.emit()
+
+    @abstractmethod
+    def _write(self) -> None: ...
+
+
+class MergeWorker(WriteWorker):
+    def __init__(
+        self,
+        pages: list[tuple[str, int]],
+        output_path: str,
+        memory_limit: Optional[int],
+        fingerprints: Optional[dict[str, str]] = None,
+        deduplicate: bool = False,
+        profile: Optional[OutputProfile] = None,
+        incremental: bool = True,
+    ):
+        super().__init__()
+        self.pages = pages
+        self.output_path = output_path
+        self.memory_limit = memory_limit
+        self.fingerprints = fingerprints
+        self.deduplicate = deduplicate
+        self.profile = profile
+        self.incremental = incremental
+        self.appended = False
+
+    def _write(self) -> None:
+        self.appended = merge_pages(
+            self.pages,
+            self.output_path,
+            memory_limit=self.memory_limit,
+            progress=self._report_progress,
+            fingerprints=self.fingerprints,
+            deduplicate=self.deduplicate,
+            profile=self.profile,
+            incremental=self.incremental,
+        )
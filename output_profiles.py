@@ -0,0 +1,41 @@
+from typing import NamedTuple, Optional
+
+# Ceiling for source objects cached while streaming the output
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+
+
+class OutputProfile(NamedTuple):
+    label: str
+    # Passed on to MuPDF's save: object garbage collection level (0-4),
+    # object streams and flate compression of uncompressed streams
+    garbage: int = 0
+    object_streams: bool = False
+    deflate: bool = False
+    # Images shown at more than max_image_dpi are resampled to target_image_dpi
+    max_image_dpi: Optional[int] = None
+    target_image_dpi: int = 150
+    jpeg_quality: int = 75
+
+    @property
+    def rewrites_output(self) -> bool:
+        return bool(
+            self.garbage or self.object_streams or self.deflate or self.max_image_dpi
+        )
+
+
+DEFAULT_PROFILE = "standard"
+PROFILES: dict[str, OutputProfile] = {
+    "standard": OutputProfile("As merged"),
+    "archive-lossless": OutputProfile(
+        "Lossless archive", garbage=4, object_streams=True, deflate=True
+    ),
+    "email": OutputProfile(
+        "Small for email",
+        garbage=4,
+        object_streams=True,
+        deflate=True,
+        max_image_dpi=225,
+        target_image_dpi=150,
+        jpeg_quality=70,
+    ),
+}
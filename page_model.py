@@ -0,0 +1,376 @@
+from array import array
+from typing import Any, Iterable, Optional
+
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QMimeData,
+    QModelIndex,
+    QObject,
+    QRect,
+    QSize,
+    Qt,
+)
+from PyQt6.QtGui import QColor, QIcon, QPainter, QPixmap
+
+import instrumentation
+from document_info import DocumentInfo
+from page_rasters import PageRasterStore, RasterKey
+from render_pool import THUMBNAIL_SIZE
+from thumbnail_cache import file_fingerprint
+
+PAGE_ROLE = Qt.ItemDataRole.UserRole
+ROWS_MIME_TYPE = "application/x-pypdfmerger-rows"
+MM_PER_POINT = 25.4 / 72
+
+
+def make_placeholder_icon(size: QSize, failed: bool = False) -> QIcon:
+    # failed crosses the page out, for pages that could not be rendered
+    pixmap = QPixmap(size)
+    pixmap.fill(Qt.GlobalColor.transparent)
+    page_width = int(size.height() / 1.414)
+    page_rect = QRect(
+        (size.width() - page_width) // 2, 0, page_width - 1, size.height() - 1
+    )
+    painter = QPainter(pixmap)
+    painter.setPen(QColor("#e0a0a0" if failed else "#d0d0d0"))
+    painter.setBrush(QColor("#fbf0f0" if failed else "#f4f4f4"))
+    painter.drawRect(page_rect)
+    if failed:
+        painter.drawLine(page_rect.topLeft(), page_rect.bottomRight())
+        painter.drawLine(page_rect.topRight(), page_rect.bottomLeft())
+    painter.end()
+    return QIcon(pixmap)
+
+
+class PageListModel(QAbstractListModel):
+    def __init__(
+        self,
+        placeholder_icon: QIcon,
+        parent: Optional[QObject] = None,
+        rasters: Optional[PageRasterStore] = None,
+        error_icon: Optional[QIcon] = None,
+    ):
+        super().__init__(parent)
+        self.placeholder_icon = placeholder_icon
+        self.error_icon = error_icon if error_icon is not None else placeholder_icon
+        # Pages whose thumbnail could not be rendered, with the reason
+        self.render_errors: dict[tuple[str, int], str] = {}
+        # Thumbnails live in the store, so models showing the same page share
+        # one image; a model without a shared store gets its own
+        self.rasters = rasters if rasters is not None else PageRasterStore()
+        self.raster_size = THUMBNAIL_SIZE
+        # The device pixel ratio of the view, kept current by its loader
+        self.raster_scale = 1.0
+
+        # Each source file is stored once; rows only hold small integers
+        self._sources: list[str] = []
+        self._source_names: list[str] = []
+        self._source_ids: dict[str, int] = {}
+        self._documents: dict[int, DocumentInfo] = {}
+        self._source_col = array("i")
+        self._page_col = array("i")
+
+    def _source_id(self, file_path: str) -> int:
+        source_id = self._source_ids.get(file_path)
+        if source_id is None:
+            source_id = len(self._sources)
+            self._sources.append(file_path)
+            self._source_names.append(file_path.split("/")[-1].split("\\")[-1])
+            self._source_ids[file_path] = source_id
+        return source_id
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._page_col)
+
+    def data(self, index: QModelIndex, role: int = PAGE_ROLE) -> Any:
+        if not index.isValid():
+            return None
+        row = index.row()
+        source_id = self._source_col[row]
+        page_num = self._page_col[row]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{row + 1}. {self._source_names[source_id]}\nPage {page_num + 1}"
+        if role == Qt.ItemDataRole.DecorationRole:
+            icon = self.rasters.icon(self.raster_key(row))
+            if icon is not None:
+                return icon
+            if (self._sources[source_id], page_num) in self.render_errors:
+                return self.error_icon
+            return self.placeholder_icon
+        if role == PAGE_ROLE:
+            return self._sources[source_id], page_num
+        if role == Qt.ItemDataRole.ToolTipRole:
+            error = self.render_errors.get((self._sources[source_id], page_num))
+            if error is not None:
+                return f"Could not show this page: {error}"
+            return self._page_tooltip(source_id, page_num)
+        return None
+
+    def _page_tooltip(self, source_id: int, page_num: int) -> Optional[str]:
+        info = self._documents.get(source_id)
+        if info is None or page_num >= info.page_count:
+            return None
+        width, height = info.page_sizes[page_num]
+        tooltip = f"{width * MM_PER_POINT:.0f} × {height * MM_PER_POINT:.0f} mm"
+        if info.rotations[page_num]:
+            tooltip += f", rotated {info.rotations[page_num]}°"
+        return tooltip
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled
+        return (
+            Qt.ItemFlag.ItemIsEnabled
+            | Qt.ItemFlag.ItemIsSelectable
+            | Qt.ItemFlag.ItemIsDragEnabled
+        )
+
+    def supportedDropActions(self) -> Qt.DropAction:
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self) -> list[str]:
+        return [ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes: Iterable[QModelIndex]) -> QMimeData:
+        mime_data = QMimeData()
+        rows = sorted(index.row() for index in indexes)
+        mime_data.setData(ROWS_MIME_TYPE, ",".join(map(str, rows)).encode())
+        return mime_data
+
+    def page(self, row: int) -> tuple[str, int]:
+        return self._sources[self._source_col[row]], self._page_col[row]
+
+    def pages(self) -> list[tuple[str, int]]:
+        sources = self._sources
+        return [
+            (sources[source_id], page_num)
+            for source_id, page_num in zip(self._source_col, self._page_col)
+        ]
+
+    def document(self, file_path: str) -> Optional[DocumentInfo]:
+        source_id = self._source_ids.get(file_path)
+        return None if source_id is None else self._documents.get(source_id)
+
+    def documents(self) -> list[DocumentInfo]:
+        return list(self._documents.values())
+
+    def documents_of(self, pages: Iterable[tuple[str, int]]) -> list[DocumentInfo]:
+        infos = (self.document(file_path) for file_path in {p for p, _ in pages})
+        return [info for info in infos if info is not None]
+
+    def fingerprints(self) -> dict[str, str]:
+        return {info.file_path: info.fingerprint for info in self._documents.values()}
+
+    def refresh_fingerprint(self, file_path: str) -> None:
+        # For files that only grew by an incremental update, so the pages in
+        # the list are still valid
+        source_id = self._source_ids.get(file_path)
+        if source_id is None:
+            return
+        info = self._documents.get(source_id)
+        if info is not None:
+            self._documents[source_id] = info._replace(
+                fingerprint=file_fingerprint(file_path)
+            )
+
+    def add_documents(self, documents: list[DocumentInfo]) -> None:
+        # Registers inspection results without adding their pages as rows
+        for info in documents:
+            self._documents[self._source_id(info.file_path)] = info
+
+    def _replace_changed(self, documents: list[DocumentInfo]) -> None:
+        # Sources added again after they changed on disk: rows keep pointing
+        # at the file, so those past its new end are dropped and the images of
+        # the old pages are forgotten
+        page_counts: dict[int, int] = {}
+        for info in documents:
+            source_id = self._source_ids.get(info.file_path)
+            old = None if source_id is None else self._documents.get(source_id)
+            if source_id is None or old is None or old.fingerprint == info.fingerprint:
+                continue
+            self._documents[source_id] = info
+            page_counts[source_id] = info.page_count
+            self.rasters.discard_source(info.file_path)
+            for key in [k for k in self.render_errors if k[0] == info.file_path]:
+                del self.render_errors[key]
+        if not page_counts:
+            return
+
+        self.take_rows_at(
+            row
+            for row, (source_id, page_num) in enumerate(
+                zip(self._source_col, self._page_col)
+            )
+            if page_num >= page_counts.get(source_id, page_num + 1)
+        )
+        self.thumbnails_changed(0, len(self._page_col) - 1)
+
+    def append_documents(self, documents: list[DocumentInfo]) -> None:
+        self._replace_changed(documents)
+        page_total = sum(info.page_count for info in documents)
+        if page_total == 0:
+            return
+        first = len(self._page_col)
+        with instrumentation.timer("model.insert"):
+            self.beginInsertRows(QModelIndex(), first, first + page_total - 1)
+            for info in documents:
+                source_id = self._source_id(info.file_path)
+                self._documents[source_id] = info
+                self._source_col.extend([source_id] * info.page_count)
+                self._page_col.extend(range(info.page_count))
+            self.endInsertRows()
+        instrumentation.count("model.inserted_rows", page_total)
+
+    def insert_pages(self, row: int, pages: list[tuple[str, int]]) -> None:
+        if not pages:
+            return
+        with instrumentation.timer("model.insert"):
+            self.beginInsertRows(QModelIndex(), row, row + len(pages) - 1)
+            self._source_col[row:row] = array(
+                "i", [self._source_id(file_path) for file_path, _ in pages]
+            )
+            self._page_col[row:row] = array("i", [page_num for _, page_num in pages])
+            self.endInsertRows()
+        instrumentation.count("model.inserted_rows", len(pages))
+
+    def take_rows(self, row: int, count: int) -> list[tuple[str, int]]:
+        if count <= 0 or row < 0 or row + count > len(self._page_col):
+            return []
+        pages = [self.page(r) for r in range(row, row + count)]
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        del self._source_col[row : row + count]
+        del self._page_col[row : row + count]
+        self.endRemoveRows()
+        return pages
+
+    def take_rows_at(self, rows: Iterable[int]) -> list[tuple[str, int]]:
+        rows = sorted({row for row in rows if 0 <= row < len(self._page_col)})
+        if not rows:
+            return []
+        if rows[-1] - rows[0] + 1 == len(rows):
+            return self.take_rows(rows[0], len(rows))
+
+        # Scattered rows leave in one reset instead of a removal per run
+        pages = [self.page(row) for row in rows]
+        taken = set(rows)
+        keep = [row for row in range(len(self._page_col)) if row not in taken]
+        self.beginResetModel()
+        self._source_col = array("i", [self._source_col[row] for row in keep])
+        self._page_col = array("i", [self._page_col[row] for row in keep])
+        self.endResetModel()
+        return pages
+
+    def remove_pages(self, pages: Iterable[tuple[str, int]]) -> None:
+        # Removes one row per page, latest rows first, wherever they were moved
+        wanted: dict[tuple[int, int], int] = {}
+        for file_path, page_num in pages:
+            source_id = self._source_ids.get(file_path)
+            if source_id is not None:
+                key = source_id, page_num
+                wanted[key] = wanted.get(key, 0) + 1
+        rows: list[int] = []
+        for row in range(len(self._page_col) - 1, -1, -1):
+            key = self._source_col[row], self._page_col[row]
+            if wanted.get(key):
+                wanted[key] -= 1
+                rows.append(row)
+        self.take_rows_at(rows)
+
+    def rows_of_source(self, file_path: str) -> list[int]:
+        source_id = self._source_ids.get(file_path)
+        return [row for row, sid in enumerate(self._source_col) if sid == source_id]
+
+    def reorder(self, order: list[int]) -> None:
+        # order lists every current row once, in its new place. Views update
+        # their selection and repaint once, however many rows moved.
+        if len(order) != len(self._page_col):
+            raise ValueError("order must list every row once")
+        self.layoutAboutToBeChanged.emit()
+        new_rows = array("i", [0]) * len(order)
+        for new_row, old_row in enumerate(order):
+            new_rows[old_row] = new_row
+        self._source_col = array("i", [self._source_col[row] for row in order])
+        self._page_col = array("i", [self._page_col[row] for row in order])
+        old_indexes = self.persistentIndexList()
+        self.changePersistentIndexList(
+            old_indexes, [self.index(new_rows[index.row()]) for index in old_indexes]
+        )
+        self.layoutChanged.emit()
+
+    def move_rows_to(self, rows: Iterable[int], destination: int) -> range:
+        # Moves the rows, in their current order, in front of destination and
+        # returns where they ended up
+        rows = sorted(set(rows))
+        moved = set(rows)
+        before = [row for row in range(destination) if row not in moved]
+        after = [
+            row for row in range(destination, len(self._page_col)) if row not in moved
+        ]
+        self.reorder(before + rows + after)
+        return range(len(before), len(before) + len(rows))
+
+    def reverse_rows(self, rows: Iterable[int]) -> None:
+        # The rows swap places among themselves; other rows stay put
+        rows = sorted(set(rows))
+        self._rearrange(rows, rows[::-1])
+
+    def sort_rows(self, rows: Iterable[int]) -> None:
+        rows = sorted(set(rows))
+        names, sources = self._source_names, self._sources
+
+        def key(row: int) -> tuple[str, str, int]:
+            source_id = self._source_col[row]
+            return names[source_id].lower(), sources[source_id], self._page_col[row]
+
+        self._rearrange(rows, sorted(rows, key=key))
+
+    def interleave_rows(
+        self, rows: Iterable[int], reverse_second: bool = False
+    ) -> None:
+        # Alternates the pages of the first source with those of the second,
+        # as needed to merge separately scanned front and back sides.
+        # reverse_second takes the second source from its last page.
+        rows = sorted(set(rows))
+        source_ids = list(dict.fromkeys(self._source_col[row] for row in rows))
+        if len(source_ids) != 2:
+            raise ValueError("interleaving needs pages from exactly two files")
+        first = [row for row in rows if self._source_col[row] == source_ids[0]]
+        second = [row for row in rows if self._source_col[row] == source_ids[1]]
+        if reverse_second:
+            second.reverse()
+        mixed = [row for pair in zip(first, second) for row in pair]
+        shorter = min(len(first), len(second))
+        self._rearrange(rows, mixed + first[shorter:] + second[shorter:])
+
+    def _rearrange(self, rows: list[int], new_rows: list[int]) -> None:
+        # Fills the positions in rows with the rows in new_rows
+        order = list(range(len(self._page_col)))
+        for position, row in zip(rows, new_rows):
+            order[position] = row
+        self.reorder(order)
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._source_col = array("i")
+        self._page_col = array("i")
+        self._documents.clear()
+        self.render_errors.clear()
+        self.endResetModel()
+
+    def raster_key(self, row: int) -> RasterKey:
+        file_path, page_num = self.page(row)
+        return file_path, page_num, self.raster_size, self.raster_scale
+
+    def has_thumbnail(self, row: int) -> bool:
+        return self.raster_key(row) in self.rasters
+
+    def thumbnails_changed(self, first: int, last: int) -> None:
+        first = max(0, first)
+        last = min(len(self._page_col) - 1, last)
+        if first <= last:
+            self.dataChanged.emit(
+                self.index(first), self.index(last), [Qt.ItemDataRole.DecorationRole]
+            )
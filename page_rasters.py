@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from typing import Optional
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QIcon, QPixmap
+
+import instrumentation
+from thumbnail_cache import Thumbnail
+from utils import thumbnail_pixmap
+
+DEFAULT_RASTER_BYTES = 128 * 1024 * 1024
+# Smaller budgets could not hold what is on screen, and views would keep
+# rendering what they just evicted from each other
+MIN_RASTER_BYTES = 32 * 1024 * 1024
+
+# file path, page number, longest side in logical pixels, device pixel ratio
+RasterKey = tuple[str, int, int, float]
+
+
+# Every page image on screen is converted once and kept here, whether the page
+# list, the trash or the preview shows it. Views keep only keys and look the
+# images up while painting, which marks them as recently used, so once all
+# views together exceed max_bytes the images shown longest ago are dropped.
+class PageRasterStore(QObject):
+    # Views may have lost images they still show and should look again
+    evicted = pyqtSignal()
+
+    def __init__(
+        self, max_bytes: int = DEFAULT_RASTER_BYTES, parent: Optional[QObject] = None
+    ) -> None:
+        super().__init__(parent)
+        self.max_bytes = max(max_bytes, MIN_RASTER_BYTES)
+        self.total_bytes = 0
+        self._rasters: OrderedDict[RasterKey, tuple[QPixmap, QIcon]] = OrderedDict()
+
+    def __contains__(self, key: RasterKey) -> bool:
+        return key in self._rasters
+
+    def __len__(self) -> int:
+        return len(self._rasters)
+
+    def pixmap(self, key: RasterKey) -> Optional[QPixmap]:
+        entry = self._use(key)
+        return entry[0] if entry is not None else None
+
+    def icon(self, key: RasterKey) -> Optional[QIcon]:
+        entry = self._use(key)
+        return entry[1] if entry is not None else None
+
+    def _use(self, key: RasterKey) -> Optional[tuple[QPixmap, QIcon]]:
+        entry = self._rasters.get(key)
+        if entry is not None:
+            self._rasters.move_to_end(key)
+        return entry
+
+    def put(self, key: RasterKey, thumbnail: Thumbnail) -> None:
+        pixmap = thumbnail_pixmap(thumbnail)
+        pixmap.setDevicePixelRatio(key[3])
+        replaced = self._rasters.pop(key, None)
+        if replaced is not None:
+            self.total_bytes -= _pixmap_bytes(replaced[0])
+        # The icon shares the pixmap's pixels rather than copying them
+        self._rasters[key] = pixmap, QIcon(pixmap)
+        self.total_bytes += _pixmap_bytes(pixmap)
+
+        # Always keep the newest image, even if it alone exceeds the budget
+        evictions = 0
+        while self.total_bytes > self.max_bytes and len(self._rasters) > 1:
+            _, (evicted, _) = self._rasters.popitem(last=False)
+            self.total_bytes -= _pixmap_bytes(evicted)
+            evictions += 1
+        if evictions:
+            instrumentation.count("raster.evictions", evictions)
+            self.evicted.emit()
+
+    def discard_source(self, file_path: str) -> None:
+        # The file changed, so images of its pages show outdated content
+        keys = [key for key in self._rasters if key[0] == file_path]
+        for key in keys:
+            pixmap, _ = self._rasters.pop(key)
+            self.total_bytes -= _pixmap_bytes(pixmap)
+        if keys:
+            self.evicted.emit()
+
+    def clear(self) -> None:
+        self._rasters.clear()
+        self.total_bytes = 0
+
+
+def _pixmap_bytes(pixmap: QPixmap) -> int:
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
@@ -1,32 +1,78 @@
 import os
+import time
+from contextlib import closing
 
-from PyPDF2 import PdfReader
-from PyQt6.QtCore import QThread, pyqtSignal, Qt
-from PyQt6.QtGui import QIcon
-from PyQt6.QtWidgets import QListWidget, QListWidgetItem
+from PyQt6.QtCore import QThread, pyqtSignal
 
-from utils import get_pdf_thumbnail
+import instrumentation
+from document_info import DocumentInfo, inspect_document
+from folder_scan import find_pdfs
+from page_model import PageListModel
+
+# Found pages are handed to the GUI thread at most this often
+BATCH_INTERVAL = 0.1
 
 
 class PdfToIcon(QThread):
     finished = pyqtSignal()
+    pages_found = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    file_failed = pyqtSignal(str, str)
 
-    def __init__(self, target_list: QListWidget, pdf_paths: list[str]):
+    def __init__(self, target_model: PageListModel, pdf_paths: list[str]):
+        # pdf_paths may include folders, which are searched recursively
         super().__init__()
-        self.target_list = target_list
+        self.target_model = target_model
         self.pdf_paths = pdf_paths
+        self.added: list[DocumentInfo] = []
+        self.added_count = 0
+        # The thread object lives in the GUI thread, so this is a queued connection
+        self.pages_found.connect(self._add_pages)
 
     def run(self) -> None:
-        for pdf_path in self.pdf_paths:
-            reader = PdfReader(pdf_path)
-            filename = os.path.basename(pdf_path)
-
-            for page_num in range(len(reader.pages)):
-                item = QListWidgetItem()
-                item.setIcon(QIcon(get_pdf_thumbnail(pdf_path, page_num)))
-                idx = self.target_list.count() + 1
-                item.setText(f"{idx}. {filename}\nPage {page_num + 1}")
-                item.setData(Qt.ItemDataRole.UserRole, (pdf_path, page_num))
-                self.target_list.addItem(item)
+        page_total = 0
+        batch: list[DocumentInfo] = []
+        last_flush = time.monotonic()
+        # Closing the search stops checking files ahead when canceled
+        with closing(find_pdfs(self.pdf_paths)) as files:
+            for file_index, (pdf_path, error) in enumerate(files):
+                if self.isInterruptionRequested():
+                    break
+                if error is None:
+                    try:
+                        # One pass over the file; thumbnails and merging reuse it
+                        info = inspect_document(pdf_path)
+                        instrumentation.count(
+                            "reader.file_bytes", os.path.getsize(pdf_path)
+                        )
+                    except Exception as e:
+                        # A broken file must not take the whole batch down
+                        error = str(e)
+                if error is not None:
+                    self.file_failed.emit(pdf_path, error)
+                else:
+                    batch.append(info)
+                    page_total += info.page_count
+
+                if batch and time.monotonic() - last_flush >= BATCH_INTERVAL:
+                    self.pages_found.emit(batch)
+                    batch = []
+                    last_flush = time.monotonic()
+                self.progress.emit(file_index + 1, page_total)
 
+        if batch:
+            self.pages_found.emit(batch)
         self.finished.emit()
+
+    def _add_pages(self, batch: list[DocumentInfo]) -> None:
+        # Thumbnails are rendered later by the ThumbnailLoader for visible rows
+        self.target_model.append_documents(batch)
+        self.added.extend(batch)
+        self.added_count += sum(info.page_count for info in batch)
+
+    def added_pages(self) -> list[tuple[str, int]]:
+        return [
+            (info.file_path, page_num)
+            for info in self.added
+            for page_num in range(info.page_count)
+        ]
@@ -0,0 +1,95 @@
+from concurrent.futures import Future
+from typing import Optional
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QPixmap
+
+import instrumentation
+from page_rasters import PageRasterStore, RasterKey
+from render_pool import RenderPool
+from thumbnail_cache import Thumbnail
+
+
+class PreviewCache(QObject):
+    preview_ready = pyqtSignal(str, int)
+    preview_failed = pyqtSignal(str, int, str)
+    _rendered = pyqtSignal(object, object)
+    _failed = pyqtSignal(object, str)
+
+    def __init__(
+        self,
+        render_pool: RenderPool,
+        rasters: PageRasterStore,
+        parent: Optional[QObject] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.render_pool = render_pool
+        # Previews count against the same budget as the thumbnails
+        self.rasters = rasters
+        self._pending: dict[RasterKey, Future[Thumbnail]] = {}
+        self._rendered.connect(self._on_rendered)
+        self._failed.connect(self._on_failed)
+
+    def get(
+        self, file_path: str, page_num: int, size: int, scale: float
+    ) -> Optional[QPixmap]:
+        pixmap = self.rasters.pixmap((file_path, page_num, size, scale))
+        if pixmap is not None:
+            instrumentation.count("preview.hits")
+        return pixmap
+
+    def request(self, file_path: str, page_num: int, size: int, scale: float) -> None:
+        key = (file_path, page_num, size, scale)
+        if key in self.rasters or key in self._pending:
+            return
+        try:
+            # size is the longest side in logical pixels; render in device pixels
+            future = self.render_pool.submit(file_path, page_num, round(size * scale))
+        except Exception as e:
+            self.preview_failed.emit(file_path, page_num, str(e))
+            return
+        instrumentation.count("preview.renders")
+        self._pending[key] = future
+
+        def done(f: Future[Thumbnail]) -> None:
+            if f.cancelled():
+                return
+            error = f.exception()
+            try:
+                # Emitted from the executor thread, delivered on the GUI thread
+                if error is not None:
+                    self._failed.emit(key, str(error))
+                else:
+                    self._rendered.emit(key, f.result())
+            except RuntimeError:
+                pass  # The cache was deleted together with its window
+
+        future.add_done_callback(done)
+
+    def prefetch(self, pages: list[tuple[str, int]], size: int, scale: float) -> None:
+        # Pages that are no longer wanted give up their place in the queue
+        wanted = {(file_path, page_num, size, scale) for file_path, page_num in pages}
+        for key in list(self._pending):
+            if key not in wanted and self._pending[key].cancel():
+                del self._pending[key]
+        for file_path, page_num in pages:
+            self.request(file_path, page_num, size, scale)
+
+    def clear(self) -> None:
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    def _on_rendered(self, key: RasterKey, thumbnail: Thumbnail) -> None:
+        if self._pending.pop(key, None) is None:
+            return
+
+        self.rasters.put(key, thumbnail)
+        file_path, page_num, _, _ = key
+        self.preview_ready.emit(file_path, page_num)
+
+    def _on_failed(self, key: RasterKey, error: str) -> None:
+        if self._pending.pop(key, None) is None:
+            return
+        file_path, page_num, _, _ = key
+        self.preview_failed.emit(file_path, page_num, error)
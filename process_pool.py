@@ -0,0 +1,58 @@
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from types import TracebackType
+from typing import Any, Callable, Optional
+
+_cancel_event: Any = None
+
+
+def _set_cancel_event(event: Any) -> None:
+    global _cancel_event
+    _cancel_event = event
+
+
+def worker_canceled() -> bool:
+    # Checked by work running in a CancelablePool, which should stop early once
+    # its result is no longer wanted
+    return _cancel_event is not None and _cancel_event.is_set()
+
+
+# Worker processes for one operation. Closing the pool, whether the work is
+# done or was canceled, drops the calls still queued and asks running ones to
+# stop, without waiting for either.
+class CancelablePool:
+    def __init__(self, workers: int) -> None:
+        # Forking a process that already runs Qt threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._cancel_event = context.Event()
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_set_cancel_event,
+            initargs=(self._cancel_event,),
+        )
+        self._futures: list[Future] = []
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        future = self._executor.submit(func, *args)
+        self._futures.append(future)
+        return future
+
+    def close(self) -> None:
+        self._cancel_event.set()
+        # cancel_futures alone is lost if the executor is garbage collected
+        # before its management thread gets to it
+        for future in self._futures:
+            future.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> "CancelablePool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
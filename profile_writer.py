@@ -0,0 +1,175 @@
+import math
+import os
+from typing import Callable, Iterable, Iterator, Optional
+
+import fitz
+
+import instrumentation
+from output_profiles import OutputProfile
+from process_pool import CancelablePool, worker_canceled
+
+# Width, height, color components and JPEG data of a recompressed image
+_Recompressed = tuple[int, int, int, bytes]
+
+
+def apply_profile(
+    input_path: str,
+    output_path: str,
+    profile: OutputProfile,
+    progress: Optional[Callable[[int, int], None]] = None,
+    workers: Optional[int] = None,
+) -> None:
+    # progress is called as work completes and may raise to cancel
+    doc = fitz.open(input_path)
+    try:
+        if profile.max_image_dpi:
+            with instrumentation.timer("profile.downsample"):
+                _downsample_images(
+                    doc, input_path, profile, profile.max_image_dpi, progress, workers
+                )
+        with instrumentation.timer("profile.save"):
+            doc.save(
+                output_path,
+                garbage=profile.garbage,
+                deflate=profile.deflate,
+                deflate_images=profile.deflate,
+                deflate_fonts=profile.deflate,
+                use_objstms=int(profile.object_streams),
+            )
+    finally:
+        doc.close()
+
+
+def _chunks(items: list, count: int) -> list[list]:
+    size = max(1, math.ceil(len(items) / max(1, count)))
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _downsample_images(
+    doc: fitz.Document,
+    file_path: str,
+    profile: OutputProfile,
+    max_dpi: int,
+    progress: Optional[Callable[[int, int], None]],
+    workers: Optional[int],
+) -> None:
+    workers = workers or os.cpu_count() or 1
+    pool = CancelablePool(workers) if workers > 1 else None
+
+    def run(func: Callable, *args: Iterable) -> Iterator:
+        # Small machines skip the pool, since spawning would cost more than it saves
+        if pool is None:
+            return map(func, *args)
+        futures = [pool.submit(func, *call) for call in zip(*args)]
+        return (future.result() for future in futures)
+
+    try:
+        # Pages first, in parallel: the lowest resolution each image is shown at
+        page_chunks = _chunks(list(range(doc.page_count)), workers * 4)
+        resolutions: dict[int, float] = {}
+        steps = len(page_chunks)
+        for done, result in enumerate(
+            run(_image_resolutions, [file_path] * steps, page_chunks), 1
+        ):
+            for xref, dpi in result.items():
+                resolutions[xref] = min(dpi, resolutions.get(xref, dpi))
+            if progress:
+                progress(done, steps * 2)
+
+        # Then every image above the threshold once, however often it is used
+        targets = [
+            (xref, profile.target_image_dpi / dpi)
+            for xref, dpi in sorted(resolutions.items())
+            if dpi > max_dpi
+        ]
+        image_chunks = _chunks(targets, workers * 4) or [[]]
+        for done, results in enumerate(
+            run(
+                _recompress_images,
+                [file_path] * len(image_chunks),
+                image_chunks,
+                [profile.jpeg_quality] * len(image_chunks),
+            ),
+            1,
+        ):
+            for xref, image in results:
+                if image is not None:
+                    _replace_image(doc, xref, image)
+            if progress:
+                progress(steps + done * steps // len(image_chunks), steps * 2)
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+def _image_resolutions(file_path: str, page_nums: list[int]) -> dict[int, float]:
+    resolutions: dict[int, float] = {}
+    with fitz.open(file_path) as doc:
+        for page_num in page_nums:
+            # A canceled save discards the result
+            if worker_canceled():
+                break
+            for info in doc[page_num].get_image_info(xrefs=True):
+                xref = info["xref"]
+                a, b, c, d, _, _ = info["transform"]
+                # Shown size in inches along the image's own axes
+                shown_width = math.hypot(a, b) / 72
+                shown_height = math.hypot(c, d) / 72
+                if not xref or not shown_width or not shown_height:
+                    continue
+                dpi = min(info["width"] / shown_width, info["height"] / shown_height)
+                resolutions[xref] = min(dpi, resolutions.get(xref, dpi))
+    return resolutions
+
+
+def _recompress_images(
+    file_path: str, targets: list[tuple[int, float]], quality: int
+) -> list[tuple[int, Optional[_Recompressed]]]:
+    results: list[tuple[int, Optional[_Recompressed]]] = []
+    with fitz.open(file_path) as doc:
+        for xref, scale in targets:
+            if worker_canceled():
+                break
+            results.append((xref, _recompress(doc, xref, scale, quality)))
+    return results
+
+
+def _recompress(
+    doc: fitz.Document, xref: int, scale: float, quality: int
+) -> Optional[_Recompressed]:
+    # Masks, bitonal images and remapped colors do not survive a JPEG round trip
+    for key in ("ImageMask", "Mask", "Decode"):
+        if doc.xref_get_key(xref, key)[0] != "null":
+            return None
+    if doc.xref_get_key(xref, "BitsPerComponent")[1] == "1":
+        return None
+
+    try:
+        pix = fitz.Pixmap(doc, xref)
+    except RuntimeError:
+        return None  # An image MuPDF cannot decode is left alone
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    width = max(1, round(pix.width * scale))
+    height = max(1, round(pix.height * scale))
+    pix = fitz.Pixmap(pix, width, height, None)
+    data = pix.tobytes("jpeg", jpg_quality=quality)
+    if len(data) >= len(doc.xref_stream_raw(xref)):
+        return None
+    instrumentation.count("profile.downsampled_images")
+    return width, height, pix.n, data
+
+
+def _replace_image(doc: fitz.Document, xref: int, image: _Recompressed) -> None:
+    width, height, components, data = image
+    doc.update_stream(xref, data, compress=0)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    doc.xref_set_key(xref, "DecodeParms", "null")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    doc.xref_set_key(
+        xref, "ColorSpace", "/DeviceGray" if components == 1 else "/DeviceRGB"
+    )
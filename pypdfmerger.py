@@ -1,30 +1,59 @@
+from __future__ import annotations
+import multiprocessing
+import os
 import sys
-from typing import Optional
-
-from PyPDF2 import PdfReader, PdfWriter
-from PyQt6.QtCore import Qt, QSize, pyqtSignal
-from PyQt6.QtGui import QKeySequence, QIcon, QShortcut, QPixmap
+from typing import TYPE_CHECKING, Optional
+
+# First, so the startup marks it takes include loading Qt
+import instrumentation
+from PyQt6.QtCore import (
+    Qt,
+    QModelIndex,
+    QSettings,
+    QPoint,
+    QSize,
+    QStandardPaths,
+    QTimer,
+    pyqtSignal,
+)
+from PyQt6.QtGui import QCloseEvent, QKeyEvent, QKeySequence, QIcon, QPixmap, QShortcut
 from PyQt6.QtWidgets import (
+    QAbstractItemView,
     QApplication,
     QProgressDialog,
     QWidget,
     QHBoxLayout,
     QFileDialog,
+    QInputDialog,
     QMessageBox,
     QDialog,
-    QListWidget,
+    QListView,
     QVBoxLayout,
     QPushButton,
-    QListWidgetItem,
     QSizePolicy,
     QLabel,
+    QMenu,
 )
 
+from document_pool import shared_pool
 from file_select_dialog import FileSelectDialog
 from interactive_list import InteractiveQListDragAndDrop
+from output_profiles import DEFAULT_MEMORY_LIMIT, DEFAULT_PROFILE, PROFILES
+from page_model import PageListModel
 from pdf_to_icon import PdfToIcon
+from page_rasters import DEFAULT_RASTER_BYTES, PageRasterStore
+from preview_cache import PreviewCache
+from render_pool import RenderPool
+from session import SESSION_FILTER, Session, check_sources, read_session, save_session
+from thumbnail_cache import DEFAULT_MAX_BYTES, ThumbnailCache
+from thumbnail_loader import ThumbnailLoader
 from utils import get_start_size, get_page_size
 
+if TYPE_CHECKING:
+    from export_worker import ExportWorker
+    from merge_worker import MergeWorker
+    from split_export import ExportJob
+
 STYLE = """
 QWidget {
     font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
@@ -62,14 +91,14 @@ QPushButton#primary:pressed {
     background-color: #004488;
 }
 
-QListWidget {
+QListView {
     background-color: #fafafa;
     border: 1px solid #e0e0e0;
     border-radius: 8px;
     padding: 8px;
 }
 
-QListWidget::item {
+QListView::item {
     background-color: white;
     border: 1px solid #e8e8e8;
     border-radius: 6px;
@@ -77,12 +106,12 @@ QListWidget::item {
     margin: 3px;
 }
 
-QListWidget::item:selected {
+QListView::item:selected {
     background-color: #e3f2fd;
     border: 2px solid #42a5f5;
 }
 
-QListWidget::item:hover {
+QListView::item:hover {
     background-color: #f8f9fa;
     border-color: #bdbdbd;
 }
@@ -98,41 +127,137 @@ QDialog {
 """
 
 
+# Pages rendered ahead in each direction so browsing the preview is instant
+PREVIEW_PREFETCH_PAGES = 2
+# Loading whole folders can fail for many files; the message lists the first
+MAX_LISTED_FAILURES = 20
+
+
 class PreviewDialog(QDialog):
-    def __init__(self, pixmap: QPixmap, title: str, parent: Optional[QWidget] = None) -> None:
+    def __init__(
+        self,
+        model: PageListModel,
+        row: int,
+        preview_cache: PreviewCache,
+        parent: Optional[QWidget] = None,
+    ) -> None:
         super().__init__(parent)
-        self.setWindowTitle(title)
+        self.model = model
+        self.preview_cache = preview_cache
+        self.row = row
+        width, self.preview_size = get_page_size()
+        self.scale = self.devicePixelRatioF()
+
+        self.label = QLabel()
+        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.label.setMinimumSize(width, self.preview_size)
 
-        label = QLabel()
-        label.setPixmap(pixmap)
-        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        hint_label = QLabel("Use the arrow keys to browse pages")
+        hint_label.setObjectName("hint")
+        hint_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
         layout = QVBoxLayout()
         layout.setContentsMargins(12, 12, 12, 12)
-        layout.addWidget(label)
+        layout.addWidget(self.label)
+        layout.addWidget(hint_label)
         self.setLayout(layout)
+
+        preview_cache.preview_ready.connect(self._on_preview_ready)
+        preview_cache.preview_failed.connect(self._on_preview_failed)
+        self.show_row(row)
+
+    def show_row(self, row: int) -> None:
+        self.row = row
+        self.setWindowTitle(f"Page Preview ({row + 1} of {self.model.rowCount()})")
+        file_path, page_num = self.model.page(row)
+        pixmap = self.preview_cache.get(
+            file_path, page_num, self.preview_size, self.scale
+        )
+        if pixmap is None:
+            # Show the list thumbnail blown up until the sharp render arrives
+            thumbnail = self.model.rasters.pixmap(self.model.raster_key(row))
+            if thumbnail is None:
+                thumbnail = self.model.placeholder_icon.pixmap(self.label.minimumSize())
+            pixmap = self._fit(thumbnail)
+        self.label.setPixmap(pixmap)
+        self.label.setToolTip("")
         self.adjustSize()
 
+        rows = [row]
+        for offset in range(1, PREVIEW_PREFETCH_PAGES + 1):
+            rows.extend((row + offset, row - offset))
+        self.preview_cache.prefetch(
+            [self.model.page(r) for r in rows if 0 <= r < self.model.rowCount()],
+            self.preview_size,
+            self.scale,
+        )
+
+    def keyPressEvent(self, a0: Optional[QKeyEvent]) -> None:
+        if a0 and a0.key() in (Qt.Key.Key_Left, Qt.Key.Key_Up, Qt.Key.Key_PageUp):
+            if self.row > 0:
+                self.show_row(self.row - 1)
+        elif a0 and a0.key() in (
+            Qt.Key.Key_Right,
+            Qt.Key.Key_Down,
+            Qt.Key.Key_PageDown,
+        ):
+            if self.row < self.model.rowCount() - 1:
+                self.show_row(self.row + 1)
+        else:
+            super().keyPressEvent(a0)
+
+    def _fit(self, pixmap: QPixmap) -> QPixmap:
+        return pixmap.scaled(
+            self.label.minimumSize(),
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+
+    def _on_preview_ready(self, file_path: str, page_num: int) -> None:
+        if (file_path, page_num) == self.model.page(self.row):
+            self.show_row(self.row)
+
+    def _on_preview_failed(self, file_path: str, page_num: int, error: str) -> None:
+        # A thumbnail, if there is one, is still better than nothing
+        if (file_path, page_num) != self.model.page(self.row):
+            return
+        if not self.model.has_thumbnail(self.row):
+            size = self.label.minimumSize()
+            self.label.setPixmap(self._fit(self.model.error_icon.pixmap(size)))
+        self.label.setToolTip(f"Could not show this page: {error}")
+
 
 class TrashCanDialog(QDialog):
-    item_restored = pyqtSignal(QListWidgetItem)
+    pages_restored = pyqtSignal(list)
 
     def __init__(
-        self, deleted_items: list[QListWidgetItem], parent: Optional[QWidget] = None
+        self,
+        deleted_pages: PageListModel,
+        render_pool: RenderPool,
+        thumbnail_cache: ThumbnailCache,
+        parent: Optional[QWidget] = None,
     ) -> None:
         super().__init__(parent)
         self.setWindowTitle("Deleted Pages")
         self.setMinimumSize(300, 400)
 
-        self.deleted_items_list = QListWidget()
+        self.deleted_items_list = QListView()
         self.deleted_items_list.setIconSize(QSize(100, 100))
-        for item in deleted_items:
-            self.deleted_items_list.addItem(item.clone())
+        self.deleted_items_list.setUniformItemSizes(True)
+        self.deleted_items_list.setSelectionMode(
+            QAbstractItemView.SelectionMode.ExtendedSelection
+        )
+        self.deleted_items_list.setModel(deleted_pages)
+        self.thumbnail_loader = ThumbnailLoader(
+            self.deleted_items_list, deleted_pages, render_pool, thumbnail_cache
+        )
 
         self.restore_button = QPushButton("Restore")
-        self.restore_button.clicked.connect(self.restore_deleted_item)
+        self.restore_button.clicked.connect(self.restore_deleted_items)
         self.restore_button.setEnabled(False)
-        self.deleted_items_list.itemSelectionChanged.connect(self._update_button_state)
+        selection_model = self.deleted_items_list.selectionModel()
+        if selection_model:
+            selection_model.selectionChanged.connect(self._update_button_state)
 
         layout = QVBoxLayout()
         layout.setContentsMargins(16, 16, 16, 16)
@@ -141,15 +266,19 @@ class TrashCanDialog(QDialog):
         layout.addWidget(self.restore_button)
         self.setLayout(layout)
 
+    def _selected_rows(self) -> list[int]:
+        selection_model = self.deleted_items_list.selectionModel()
+        if not selection_model:
+            return []
+        return sorted(index.row() for index in selection_model.selectedIndexes())
+
     def _update_button_state(self) -> None:
-        self.restore_button.setEnabled(bool(self.deleted_items_list.currentItem()))
+        self.restore_button.setEnabled(bool(self._selected_rows()))
 
-    def restore_deleted_item(self) -> None:
-        selected_item = self.deleted_items_list.takeItem(
-            self.deleted_items_list.currentRow()
-        )
-        if selected_item:
-            self.item_restored.emit(selected_item.clone())
+    def restore_deleted_items(self) -> None:
+        rows = self._selected_rows()
+        if rows:
+            self.pages_restored.emit(rows)
             self.close()
 
 
@@ -161,20 +290,49 @@ class PyPDFMerger(QWidget):
         self.setGeometry(x, y, width, height)
         self.setMinimumSize(400, 500)
 
-        self.deleted_items: list[QListWidgetItem] = []
+        self.settings = QSettings("PyPDFMerger", "PyPDFMerger")
+        # 0 lets the pool pick one worker per spare CPU core
+        render_workers = int(self.settings.value("renderWorkers", 0))
+        self.render_pool = RenderPool(render_workers or None)
+        cache_dir = os.path.join(
+            QStandardPaths.writableLocation(
+                QStandardPaths.StandardLocation.GenericCacheLocation
+            ),
+            "PyPDFMerger",
+        )
+        cache_size = int(self.settings.value("thumbnailCacheSize", DEFAULT_MAX_BYTES))
+        self.thumbnail_cache = ThumbnailCache(cache_dir, cache_size)
+        # One budget for the images of the page list, the trash and the preview
+        raster_bytes = int(
+            self.settings.value("rasterMemoryLimit", DEFAULT_RASTER_BYTES)
+        )
+        self.page_rasters = PageRasterStore(raster_bytes, self)
+        self.preview_cache = PreviewCache(self.render_pool, self.page_rasters, self)
+
+        self.upload_workers: list[PdfToIcon] = []
+        self.merge_workers: list[MergeWorker] = []
+        self.export_workers: list[ExportWorker] = []
         self._setup_ui()
         self._setup_shortcuts()
 
     def _setup_ui(self) -> None:
         self.file_list = InteractiveQListDragAndDrop(main_window=self)
         self.file_list.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        self.file_list.itemDoubleClicked.connect(self._on_item_double_clicked)
-
-        model = self.file_list.model()
-        if model:
-            model.rowsInserted.connect(self._update_item_numbers)
-            model.rowsRemoved.connect(self._update_item_numbers)
-            model.rowsMoved.connect(self._update_item_numbers)
+        self.file_list.doubleClicked.connect(self._on_item_double_clicked)
+        self.file_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.file_list.customContextMenuRequested.connect(self._show_list_menu)
+        self.thumbnail_loader = ThumbnailLoader(
+            self.file_list,
+            self.file_list.page_model,
+            self.render_pool,
+            self.thumbnail_cache,
+        )
+        self.deleted_pages = PageListModel(
+            self.file_list.page_model.placeholder_icon,
+            self,
+            self.page_rasters,
+            self.file_list.page_model.error_icon,
+        )
 
         hint_label = QLabel("Drag to reorder")
         hint_label.setObjectName("hint")
@@ -183,21 +341,44 @@ class PyPDFMerger(QWidget):
         self.add_button = QPushButton("Add")
         self.delete_button = QPushButton("Delete")
         self.trash_button = QPushButton("Trash")
+        self.session_button = QPushButton("Session")
+        self.split_button = QPushButton("Split")
         self.save_button = QPushButton("Save PDF")
         self.save_button.setObjectName("primary")
 
         self.delete_button.setToolTip("Delete or Backspace")
 
         self.add_button.clicked.connect(self.show_file_select_dialog)
-        self.delete_button.clicked.connect(self.remove_selected_item)
+        self.delete_button.clicked.connect(self.remove_selected_items)
         self.trash_button.clicked.connect(self.show_trashcan_dialog)
         self.save_button.clicked.connect(self.save_file)
 
+        session_menu = QMenu(self.session_button)
+        open_action = session_menu.addAction("Open Session...")
+        save_action = session_menu.addAction("Save Session...")
+        if open_action and save_action:
+            open_action.triggered.connect(self.open_session)
+            save_action.triggered.connect(self.save_session)
+        self.open_session_action = open_action
+        self.session_button.setMenu(session_menu)
+
+        split_menu = QMenu(self.split_button)
+        source_action = split_menu.addAction("One File per Source...")
+        chunks_action = split_menu.addAction("Chunks of Pages...")
+        pages_action = split_menu.addAction("One File per Page...")
+        if source_action and chunks_action and pages_action:
+            source_action.triggered.connect(self.export_by_source)
+            chunks_action.triggered.connect(lambda: self.export_chunks())
+            pages_action.triggered.connect(lambda: self.export_chunks(1))
+        self.split_button.setMenu(split_menu)
+
         button_row = QHBoxLayout()
         button_row.setSpacing(8)
         button_row.addWidget(self.add_button)
         button_row.addWidget(self.delete_button)
         button_row.addWidget(self.trash_button)
+        button_row.addWidget(self.session_button)
+        button_row.addWidget(self.split_button)
 
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(16, 16, 16, 16)
@@ -210,46 +391,196 @@ class PyPDFMerger(QWidget):
 
         self.setLayout(main_layout)
 
-    def _update_item_numbers(self) -> None:
-        for i in range(self.file_list.count()):
-            item = self.file_list.item(i)
-            if item:
-                data = item.data(Qt.ItemDataRole.UserRole)
-                if data:
-                    file_path, page_num = data
-                    filename = file_path.split("/")[-1].split("\\")[-1]
-                    item.setText(f"{i + 1}. {filename}\nPage {page_num + 1}")
+    def closeEvent(self, a0: Optional[QCloseEvent]) -> None:
+        for worker in self.upload_workers:
+            worker.requestInterruption()
+            worker.wait()
+        # Let running saves finish rather than discarding finished work
+        for merge_worker in self.merge_workers:
+            merge_worker.wait()
+        for export_worker in self.export_workers:
+            export_worker.wait()
+        self.render_pool.shutdown()
+        self.thumbnail_cache.close()
+        shared_pool.close()
+        super().closeEvent(a0)
 
     def _setup_shortcuts(self) -> None:
         delete_shortcut = QShortcut(QKeySequence(Qt.Key.Key_Delete), self)
-        delete_shortcut.activated.connect(self.remove_selected_item)
+        delete_shortcut.activated.connect(self.remove_selected_items)
 
         backspace_shortcut = QShortcut(QKeySequence(Qt.Key.Key_Backspace), self)
-        backspace_shortcut.activated.connect(self.remove_selected_item)
+        backspace_shortcut.activated.connect(self.remove_selected_items)
+
+        self.open_session_shortcut = QShortcut(QKeySequence("Ctrl+O"), self)
+        self.open_session_shortcut.activated.connect(self.open_session)
+
+        save_session_shortcut = QShortcut(QKeySequence("Ctrl+Shift+S"), self)
+        save_session_shortcut.activated.connect(self.save_session)
 
-    def _on_item_double_clicked(self, item: QListWidgetItem) -> None:
-        if item.icon():
-            width, height = get_page_size()
-            pixmap = item.icon().pixmap(QSize(width, height))
-            dialog = PreviewDialog(pixmap, "Page Preview", self)
-            dialog.exec()
+        clear_cache_shortcut = QShortcut(QKeySequence("Ctrl+Shift+Delete"), self)
+        clear_cache_shortcut.activated.connect(self.clear_thumbnail_cache)
 
-    def remove_selected_item(self) -> None:
-        selected_item = self.file_list.takeItem(self.file_list.currentRow())
-        if selected_item:
-            self.deleted_items.append(selected_item)
+    def _update_session_open(self) -> None:
+        # Opening a session replaces the list that running loads append to
+        enabled = not self.upload_workers
+        if self.open_session_action:
+            self.open_session_action.setEnabled(enabled)
+        self.open_session_shortcut.setEnabled(enabled)
+
+    def _on_item_double_clicked(self, index: QModelIndex) -> None:
+        dialog = PreviewDialog(
+            self.file_list.page_model, index.row(), self.preview_cache, self
+        )
+        dialog.exec()
+        dialog.deleteLater()
+
+    def remove_selected_items(self) -> None:
+        self._delete_rows(self.file_list.selected_rows())
+
+    def _delete_rows(self, rows: list[int]) -> None:
+        page_model = self.file_list.page_model
+        pages = page_model.take_rows_at(rows)
+        # The trash finds cached thumbnails without reading the sources again
+        self.deleted_pages.add_documents(page_model.documents_of(pages))
+        self.deleted_pages.insert_pages(self.deleted_pages.rowCount(), pages)
+
+    def _show_list_menu(self, pos: QPoint) -> None:
+        menu = QMenu(self)
+        if self.file_list.page_model.rowCount() > 0:
+            self._add_page_actions(menu, pos)
+            menu.addSeparator()
+        menu.addAction("Clear Thumbnail Cache...", self.clear_thumbnail_cache)
+
+        viewport = self.file_list.viewport()
+        if viewport:
+            menu.exec(viewport.mapToGlobal(pos))
+        menu.deleteLater()
+
+    def _add_page_actions(self, menu: QMenu, pos: QPoint) -> None:
+        page_model = self.file_list.page_model
+        selected = self.file_list.selected_rows()
+        # Unless several pages are selected, the commands apply to the whole list
+        rows = selected if len(selected) > 1 else list(range(page_model.rowCount()))
+        two_sources = len({page_model.page(row)[0] for row in rows}) == 2
+
+        menu.addAction("Reverse Order", lambda: page_model.reverse_rows(rows))
+        menu.addAction("Sort by File and Page", lambda: page_model.sort_rows(rows))
+        interleave = menu.addAction(
+            "Interleave Two Files", lambda: page_model.interleave_rows(rows)
+        )
+        interleave_reversed = menu.addAction(
+            "Interleave Two Files, Second Reversed",
+            lambda: page_model.interleave_rows(rows, reverse_second=True),
+        )
+        if interleave and interleave_reversed:
+            interleave.setEnabled(two_sources)
+            interleave_reversed.setEnabled(two_sources)
+
+        index = self.file_list.indexAt(pos)
+        if index.isValid():
+            file_path, _ = page_model.page(index.row())
+            menu.addSeparator()
+            menu.addAction(
+                f"Delete All Pages of {os.path.basename(file_path)}",
+                lambda: self._delete_rows(page_model.rows_of_source(file_path)),
+            )
+
+    def clear_thumbnail_cache(self) -> None:
+        answer = QMessageBox.question(
+            self, "PDF Merger", "Clear all cached page thumbnails?"
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.thumbnail_cache.clear()
 
     def show_trashcan_dialog(self) -> None:
-        dialog = TrashCanDialog(self.deleted_items, self)
-        dialog.item_restored.connect(self.restore_deleted_item)
+        dialog = TrashCanDialog(
+            self.deleted_pages, self.render_pool, self.thumbnail_cache, self
+        )
+        dialog.pages_restored.connect(self.restore_deleted_items)
         dialog.exec()
+        dialog.deleteLater()
+
+    def restore_deleted_items(self, rows: list[int]) -> None:
+        pages = self.deleted_pages.take_rows_at(rows)
+        page_model = self.file_list.page_model
+        page_model.insert_pages(page_model.rowCount(), pages)
+
+    def save_session(self) -> None:
+        page_model = self.file_list.page_model
+        pages = page_model.pages()
+        deleted_pages = self.deleted_pages.pages()
+        if not pages and not deleted_pages:
+            QMessageBox.warning(self, "PDF Merger", "No pages to save.")
+            return
+
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Session", "", SESSION_FILTER
+        )
+        if not file_path:
+            return
+        if not file_path.lower().endswith(".pdfsession"):
+            file_path += ".pdfsession"
+
+        used = {file_path for file_path, _ in pages + deleted_pages}
+        # Sources only the trash still uses are known to the trash model alone;
+        # the list's inspection results are the newer ones
+        documents = list(
+            {
+                info.file_path: info
+                for info in self.deleted_pages.documents() + page_model.documents()
+                if info.file_path in used
+            }.values()
+        )
+        # Whatever was rendered so far travels along, so restoring needs no renders
+        thumbnails = self.thumbnail_cache.entries(
+            [info.fingerprint for info in documents]
+        )
+        try:
+            save_session(
+                file_path, Session(documents, pages, deleted_pages, thumbnails)
+            )
+        except OSError as e:
+            QMessageBox.critical(self, "PDF Merger", f"Could not save session:\n{e}")
 
-    def restore_deleted_item(self, item: QListWidgetItem) -> None:
-        for deleted_item in self.deleted_items:
-            if deleted_item.text() == item.text():
-                self.file_list.addItem(deleted_item)
-                self.deleted_items.remove(deleted_item)
-                break
+    def open_session(self) -> None:
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Open Session", "", SESSION_FILTER
+        )
+        if not file_path:
+            return
+        if self.file_list.count() or self.deleted_pages.rowCount():
+            answer = QMessageBox.question(
+                self, "PDF Merger", "Replace the current pages with the session?"
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                return
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            # Sources are not parsed again unless they changed on disk
+            session, problems = check_sources(read_session(file_path))
+            self.thumbnail_cache.put_many(session.thumbnails)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "PDF Merger", f"Could not open session:\n{e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        self.preview_cache.clear()
+        self.page_rasters.clear()
+        page_model = self.file_list.page_model
+        page_model.clear()
+        page_model.add_documents(session.documents)
+        page_model.insert_pages(0, session.pages)
+        self.deleted_pages.clear()
+        self.deleted_pages.add_documents(session.documents)
+        self.deleted_pages.insert_pages(0, session.deleted_pages)
+
+        if problems:
+            QMessageBox.warning(
+                self, "PDF Merger", "Could not restore:\n" + "\n".join(problems)
+            )
 
     def show_file_select_dialog(self) -> None:
         dialog = FileSelectDialog(self)
@@ -262,54 +593,285 @@ class PyPDFMerger(QWidget):
         if not files:
             return
 
-        worker = PdfToIcon(self.file_list, files)
+        worker = PdfToIcon(self.file_list.page_model, files)
+        # How many files folders hold is only known once they are searched
+        file_count = 0 if any(os.path.isdir(path) for path in files) else len(files)
 
-        progress = QProgressDialog("Loading PDFs...", None, 0, 0, self)
+        progress = QProgressDialog("Loading PDFs...", "Cancel", 0, file_count, self)
         progress.setWindowTitle("Loading")
-        progress.setCancelButton(None)
-        progress.setWindowModality(Qt.WindowModality.ApplicationModal)
-        progress.setMinimumDuration(0)
+        # The pages found so far can be worked with while the rest loads
+        progress.setWindowModality(Qt.WindowModality.NonModal)
+        progress.setMinimumDuration(300)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        if not file_count:
+            # Without progress to report the dialog does not show by itself
+            show_timer = QTimer(progress)
+            show_timer.setSingleShot(True)
+            show_timer.timeout.connect(progress.show)
+            show_timer.start(progress.minimumDuration())
+
+        failures: list[str] = []
+
+        def on_progress(files_done: int, pages_found: int) -> None:
+            if file_count:
+                progress.setValue(files_done)
+                current = f"{min(files_done + 1, file_count)} of {file_count}"
+            else:
+                current = str(files_done + 1)
+            progress.setLabelText(
+                f"Loading file {current} ({pages_found} pages found)..."
+            )
+
+        worker.progress.connect(on_progress)
+        worker.file_failed.connect(
+            lambda path, error: failures.append(f"{os.path.basename(path)}: {error}")
+        )
+        progress.canceled.connect(worker.requestInterruption)
+        worker.finished.connect(
+            lambda: self._on_upload_finished(worker, progress, failures)
+        )
 
-        worker.finished.connect(progress.close)
-        progress.show()
+        self.upload_workers.append(worker)
+        self._update_session_open()
         worker.start()
 
-        while worker.isRunning():
-            QApplication.processEvents()
+    def _on_upload_finished(
+        self, worker: PdfToIcon, progress: QProgressDialog, failures: list[str]
+    ) -> None:
+        canceled = progress.wasCanceled()
+        progress.close()
+        progress.deleteLater()
+        worker.wait()
+        self.upload_workers.remove(worker)
+        worker.deleteLater()
+        self._update_session_open()
+
+        if canceled and worker.added_count:
+            answer = QMessageBox.question(
+                self,
+                "PDF Merger",
+                f"Loading was canceled. Keep the {worker.added_count} pages "
+                "loaded so far?",
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                # The new rows may have been moved, deleted or followed by
+                # other loads meanwhile, so they are looked up by page
+                self.file_list.page_model.remove_pages(worker.added_pages())
+
+        if failures:
+            shown = failures[:MAX_LISTED_FAILURES]
+            if len(failures) > len(shown):
+                shown.append(f"and {len(failures) - len(shown)} more")
+            QMessageBox.warning(
+                self, "PDF Merger", "Could not load:\n" + "\n".join(shown)
+            )
 
     def save_file(self) -> None:
         if self.file_list.count() == 0:
             QMessageBox.warning(self, "PDF Merger", "No pages to save.")
             return
 
-        writer = PdfWriter()
-        for i in range(self.file_list.count()):
-            page_item = self.file_list.item(i)
-            if not page_item:
-                continue
-            file_path, page_num = page_item.data(Qt.ItemDataRole.UserRole)
-            with open(file_path, "rb") as f:
-                reader = PdfReader(f)
-                writer.add_page(reader.pages[page_num])
-
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "Save PDF", "", "PDF Files (*.pdf)"
+        # Each output profile is offered as its own file type
+        filters = {
+            f"PDF, {p.label.lower()} (*.pdf)": name for name, p in PROFILES.items()
+        }
+        last_profile = self.settings.value("outputProfile", DEFAULT_PROFILE)
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "Save PDF",
+            "",
+            ";;".join(filters),
+            next((f for f, name in filters.items() if name == last_profile), ""),
         )
         if not file_path:
             return
+        profile_name = filters.get(selected_filter, DEFAULT_PROFILE)
+        self.settings.setValue("outputProfile", profile_name)
 
         if not file_path.lower().endswith(".pdf"):
             file_path += ".pdf"
 
-        try:
-            with open(file_path, "wb") as f:
-                writer.write(f)
-            QMessageBox.information(self, "PDF Merger", "PDF saved successfully.")
-        except OSError as e:
-            QMessageBox.critical(self, "PDF Merger", f"Could not save file:\n{e}")
+        # PyPDF2 loads with the first save instead of slowing down every start
+        from merge_worker import MergeWorker
+
+        # 0 builds the whole document in memory instead of streaming it
+        memory_limit = int(
+            self.settings.value("mergeMemoryLimit", DEFAULT_MEMORY_LIMIT)
+        )
+        # The page order is captured now, so the list can be edited while saving
+        pages = self.file_list.page_model.pages()
+        worker = MergeWorker(
+            pages,
+            file_path,
+            memory_limit or None,
+            self.file_list.page_model.fingerprints(),
+            self.settings.value("deduplicateOutput", False, type=bool),
+            PROFILES[profile_name],
+            self.settings.value("incrementalSave", True, type=bool),
+        )
+
+        progress = QProgressDialog(
+            f"Saving {os.path.basename(file_path)}...", "Cancel", 0, len(pages), self
+        )
+        progress.setWindowTitle("Saving")
+        progress.setWindowModality(Qt.WindowModality.NonModal)
+        progress.setMinimumDuration(500)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+
+        def report_progress(done: int, total: int) -> None:
+            # Output profiles report a second pass with its own total
+            progress.setMaximum(total)
+            progress.setValue(done)
+
+        worker.progress.connect(report_progress)
+        progress.canceled.connect(worker.requestInterruption)
+        worker.finished.connect(lambda: self._on_save_finished(worker, progress))
+
+        self.merge_workers.append(worker)
+        worker.start()
+
+    def _on_save_finished(self, worker: MergeWorker, progress: QProgressDialog) -> None:
+        progress.close()
+        progress.deleteLater()
+        worker.wait()
+        self.merge_workers.remove(worker)
+        worker.deleteLater()
+
+        if worker.canceled:
+            return
+        if worker.error is not None:
+            QMessageBox.critical(
+                self, "PDF Merger", f"Could not save file:\n{worker.error}"
+            )
+            return
+
+        if worker.appended:
+            from merge import same_file
+
+            # The original bytes are unchanged, so its pages in the list still are
+            page_model = self.file_list.page_model
+            for file_path in page_model.fingerprints():
+                if same_file(file_path, worker.output_path):
+                    page_model.refresh_fingerprint(file_path)
+
+        QMessageBox.information(self, "PDF Merger", "PDF saved successfully.")
+
+    def export_by_source(self) -> None:
+        from split_export import split_by_source
+
+        folder = self._ask_export_folder()
+        if folder:
+            self._export(split_by_source(self.file_list.page_model.pages(), folder))
+
+    def export_chunks(self, chunk_size: Optional[int] = None) -> None:
+        if self.file_list.count() == 0:
+            QMessageBox.warning(self, "PDF Merger", "No pages to save.")
+            return
+        if chunk_size is None:
+            chunk_size, ok = QInputDialog.getInt(
+                self,
+                "Split PDF",
+                "Pages per file:",
+                int(self.settings.value("splitChunkSize", 10)),
+                1,
+            )
+            if not ok:
+                return
+            self.settings.setValue("splitChunkSize", chunk_size)
+        folder = self._ask_export_folder()
+        if folder:
+            from split_export import split_into_chunks
+
+            pages = self.file_list.page_model.pages()
+            # Named after the first source: intake-001.pdf, intake-002.pdf, ...
+            prefix = os.path.splitext(os.path.basename(pages[0][0]))[0]
+            self._export(split_into_chunks(pages, folder, prefix, chunk_size))
+
+    def _ask_export_folder(self) -> str:
+        if self.file_list.count() == 0:
+            QMessageBox.warning(self, "PDF Merger", "No pages to save.")
+            return ""
+        folder = QFileDialog.getExistingDirectory(
+            self, "Export To Folder", self.settings.value("lastExportDirectory", "")
+        )
+        if folder:
+            self.settings.setValue("lastExportDirectory", folder)
+        return folder
+
+    def _export(self, jobs: list[ExportJob]) -> None:
+        existing = [path for path, _ in jobs if os.path.exists(path)]
+        if existing:
+            answer = QMessageBox.question(
+                self,
+                "PDF Merger",
+                f"{len(existing)} of the {len(jobs)} files already exist in this "
+                "folder. Replace them?",
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                return
+
+        from export_worker import ExportWorker
+
+        memory_limit = int(
+            self.settings.value("mergeMemoryLimit", DEFAULT_MEMORY_LIMIT)
+        )
+        # 0 uses one worker process per CPU core
+        export_workers = int(self.settings.value("exportWorkers", 0))
+        worker = ExportWorker(
+            jobs,
+            memory_limit or None,
+            self.file_list.page_model.fingerprints(),
+            self.settings.value("deduplicateOutput", False, type=bool),
+            export_workers or None,
+        )
+
+        page_count = sum(len(pages) for _, pages in jobs)
+        progress = QProgressDialog(
+            f"Writing {len(jobs)} files...", "Cancel", 0, page_count, self
+        )
+        progress.setWindowTitle("Exporting")
+        progress.setWindowModality(Qt.WindowModality.NonModal)
+        progress.setMinimumDuration(500)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+
+        worker.progress.connect(lambda done, _: progress.setValue(done))
+        progress.canceled.connect(worker.requestInterruption)
+        worker.finished.connect(lambda: self._on_export_finished(worker, progress))
+
+        self.export_workers.append(worker)
+        worker.start()
+
+    def _on_export_finished(
+        self, worker: ExportWorker, progress: QProgressDialog
+    ) -> None:
+        progress.close()
+        progress.deleteLater()
+        worker.wait()
+        self.export_workers.remove(worker)
+        worker.deleteLater()
+
+        if worker.canceled:
+            QMessageBox.information(
+                self,
+                "PDF Merger",
+                "Export canceled. Files finished before that were kept.",
+            )
+        elif worker.error is not None:
+            QMessageBox.critical(
+                self, "PDF Merger", f"Could not export files:\n{worker.error}"
+            )
+        else:
+            QMessageBox.information(
+                self, "PDF Merger", f"{len(worker.jobs)} PDFs saved successfully."
+            )
 
 
 def main() -> None:
+    multiprocessing.freeze_support()
+    instrumentation.mark("startup.imports")
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     app.setStyleSheet(STYLE)
@@ -317,6 +879,9 @@ def main() -> None:
 
     window = PyPDFMerger()
     window.show()
+    instrumentation.mark("startup.window")
+    # Runs once the event loop is up and has painted the window
+    QTimer.singleShot(0, lambda: instrumentation.mark("startup.ready"))
 
     sys.exit(app.exec())
 
@@ -0,0 +1,70 @@
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import instrumentation
+from document_pool import shared_pool
+from thumbnail_cache import Thumbnail
+
+# Longest side of a thumbnail in pixels, matching the list's icon size
+THUMBNAIL_SIZE = 140
+
+
+def render_thumbnail(
+    file_path: str, page_num: int, size: int = THUMBNAIL_SIZE
+) -> Thumbnail:
+    # Rendered straight at the target size and returned as raw RGB samples,
+    # so there is no image codec or rescaling pass on either side
+    import fitz
+
+    with (
+        instrumentation.timer("render.rasterize"),
+        shared_pool.open(file_path) as source,
+        source.document() as doc,
+    ):
+        page = doc.load_page(page_num)
+        zoom = size / max(page.rect.width, page.rect.height, 1)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        thumbnail = pix.width, pix.height, pix.samples
+    instrumentation.count("render.pages")
+    return thumbnail
+
+
+def default_worker_count() -> int:
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+class RenderPool:
+    def __init__(self, workers: Optional[int] = None) -> None:
+        self.workers = workers or default_worker_count()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that already runs Qt threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(
+        self, file_path: str, page_num: int, size: int = THUMBNAIL_SIZE
+    ) -> "Future[Thumbnail]":
+        try:
+            return self._get_executor().submit(
+                render_thumbnail, file_path, page_num, size
+            )
+        except BrokenProcessPool:
+            # A worker crashed or was killed, which leaves the executor unusable
+            self.shutdown()
+            return self._get_executor().submit(
+                render_thumbnail, file_path, page_num, size
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,134 @@
+import json
+import os
+import uuid
+import zipfile
+from typing import NamedTuple
+
+from document_info import DocumentInfo, inspect_document
+from thumbnail_cache import CacheEntry, file_fingerprint
+
+SESSION_VERSION = 1
+SESSION_FILTER = "PDF Merger sessions (*.pdfsession)"
+
+
+class Session(NamedTuple):
+    documents: list[DocumentInfo]
+    pages: list[tuple[str, int]]
+    deleted_pages: list[tuple[str, int]]
+    thumbnails: list[CacheEntry]
+
+
+# A session is a zip archive holding session.json and, in thumbnails.bin, the
+# samples of every thumbnail listed there, one after the other
+def save_session(file_path: str, session: Session) -> None:
+    document_ids = {info.file_path: i for i, info in enumerate(session.documents)}
+    manifest = {
+        "version": SESSION_VERSION,
+        "documents": [
+            {
+                "path": info.file_path,
+                "fingerprint": info.fingerprint,
+                "page_sizes": info.page_sizes,
+                "rotations": info.rotations,
+            }
+            for info in session.documents
+        ],
+        # Rows are stored as [document index, page number]
+        "pages": [[document_ids[path], page_num] for path, page_num in session.pages],
+        "deleted_pages": [
+            [document_ids[path], page_num] for path, page_num in session.deleted_pages
+        ],
+        "thumbnails": [
+            [fingerprint, page_num, size, width, height]
+            for fingerprint, page_num, size, (width, height, _) in session.thumbnails
+        ],
+    }
+
+    temp_path = f"{file_path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        # Raw samples compress well enough at the fastest level
+        with zipfile.ZipFile(
+            temp_path, "x", zipfile.ZIP_DEFLATED, compresslevel=1
+        ) as archive:
+            archive.writestr("session.json", json.dumps(manifest))
+            with archive.open("thumbnails.bin", "w") as blob:
+                for _, _, _, (_, _, data) in session.thumbnails:
+                    blob.write(data)
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def read_session(file_path: str) -> Session:
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            manifest = json.loads(archive.read("session.json"))
+            blob = archive.read("thumbnails.bin")
+    except (KeyError, zipfile.BadZipFile) as e:
+        raise ValueError("not a session file") from e
+    if manifest.get("version") != SESSION_VERSION:
+        raise ValueError("the session was saved by an incompatible version")
+
+    documents = [
+        DocumentInfo(
+            document["path"],
+            document["fingerprint"],
+            [(width, height) for width, height in document["page_sizes"]],
+            document["rotations"],
+        )
+        for document in manifest["documents"]
+    ]
+    paths = [info.file_path for info in documents]
+
+    thumbnails: list[CacheEntry] = []
+    offset = 0
+    for fingerprint, page_num, size, width, height in manifest["thumbnails"]:
+        end = offset + width * height * 3
+        thumbnails.append(
+            (fingerprint, page_num, size, (width, height, blob[offset:end]))
+        )
+        offset = end
+
+    return Session(
+        documents,
+        [(paths[i], page_num) for i, page_num in manifest["pages"]],
+        [(paths[i], page_num) for i, page_num in manifest["deleted_pages"]],
+        thumbnails,
+    )
+
+
+def check_sources(session: Session) -> tuple[Session, list[str]]:
+    # Only sources that changed on disk are inspected again; their thumbnails
+    # are dropped so those pages get rendered anew. Missing sources and pages
+    # that no longer exist are left out and reported.
+    documents: list[DocumentInfo] = []
+    problems: list[str] = []
+    for info in session.documents:
+        try:
+            if file_fingerprint(info.file_path) != info.fingerprint:
+                info = inspect_document(info.file_path)
+        except Exception as e:
+            # Missing, unreadable or broken since the session was saved
+            problems.append(f"{os.path.basename(info.file_path)}: {e}")
+        else:
+            documents.append(info)
+
+    page_counts = {info.file_path: info.page_count for info in documents}
+    fingerprints = {info.fingerprint for info in documents}
+
+    def existing(pages: list[tuple[str, int]]) -> list[tuple[str, int]]:
+        return [
+            (path, page_num)
+            for path, page_num in pages
+            if page_num < page_counts.get(path, 0)
+        ]
+
+    pages = existing(session.pages)
+    deleted_pages = existing(session.deleted_pages)
+    dropped = len(session.pages) + len(session.deleted_pages)
+    dropped -= len(pages) + len(deleted_pages)
+    if dropped:
+        problems.append(f"{dropped} pages could not be restored")
+    thumbnails = [entry for entry in session.thumbnails if entry[0] in fingerprints]
+    return Session(documents, pages, deleted_pages, thumbnails), problems
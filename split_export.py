@@ -0,0 +1,147 @@
+import math
+import os
+from concurrent.futures import as_completed
+from typing import Callable, Optional
+
+from merge import MergeCanceled, ReaderPool, check_fingerprints, merge_pages
+from process_pool import CancelablePool, worker_canceled
+from output_profiles import DEFAULT_MEMORY_LIMIT
+
+# Outputs are handed to the workers in batches of at most this many pages, so
+# progress and cancellation are not held up by one worker's long queue
+EXPORT_BATCH_PAGES = 200
+# Parsed sources each worker keeps for its next batches
+MAX_WORKER_READERS = 16
+
+# An output file and the pages written to it, in order
+ExportJob = tuple[str, list[tuple[str, int]]]
+
+_worker_readers: Optional[ReaderPool] = None
+
+
+def split_by_source(pages: list[tuple[str, int]], output_dir: str) -> list[ExportJob]:
+    # One file per source, named after it, holding its pages in list order
+    groups: dict[str, list[tuple[str, int]]] = {}
+    for file_path, page_num in pages:
+        groups.setdefault(file_path, []).append((file_path, page_num))
+
+    jobs: list[ExportJob] = []
+    used_names: set[str] = set()
+    for file_path, group in groups.items():
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        name = f"{stem}.pdf"
+        suffix = 2
+        # Sources from different folders may share a name
+        while name.lower() in used_names:
+            name = f"{stem}-{suffix}.pdf"
+            suffix += 1
+        used_names.add(name.lower())
+        jobs.append((os.path.join(output_dir, name), group))
+    return jobs
+
+
+def split_into_chunks(
+    pages: list[tuple[str, int]], output_dir: str, prefix: str, chunk_size: int
+) -> list[ExportJob]:
+    # prefix-001.pdf, prefix-002.pdf, ... with chunk_size pages each
+    if chunk_size < 1:
+        raise ValueError("the chunk size must be at least 1")
+    chunks = [pages[i : i + chunk_size] for i in range(0, len(pages), chunk_size)]
+    width = max(3, len(str(len(chunks))))
+    return [
+        (os.path.join(output_dir, f"{prefix}-{i:0{width}d}.pdf"), chunk)
+        for i, chunk in enumerate(chunks, 1)
+    ]
+
+
+def export_pages(
+    jobs: list[ExportJob],
+    memory_limit: Optional[int] = DEFAULT_MEMORY_LIMIT,
+    progress: Optional[Callable[[int, int], None]] = None,
+    fingerprints: Optional[dict[str, str]] = None,
+    deduplicate: bool = False,
+    workers: Optional[int] = None,
+) -> None:
+    # Every output is written like a merge of its pages, in worker processes
+    # that keep their parsed sources from batch to batch. progress is called
+    # with the pages written so far and may raise MergeCanceled; outputs that
+    # were finished before a cancellation or failure are kept.
+    pages = [page for _, job_pages in jobs for page in job_pages]
+    check_fingerprints(pages, fingerprints)
+    sources = {os.path.normcase(os.path.realpath(path)) for path, _ in pages}
+    for output_path, _ in jobs:
+        if os.path.normcase(os.path.realpath(output_path)) in sources:
+            raise ValueError(
+                f"{os.path.basename(output_path)} would overwrite one of the sources"
+            )
+
+    workers = workers or os.cpu_count() or 1
+    # Small enough that every worker gets several batches
+    batch_pages = max(1, min(EXPORT_BATCH_PAGES, math.ceil(len(pages) / workers / 4)))
+    batches: list[list[ExportJob]] = []
+    size = batch_pages
+    for job in jobs:
+        if size >= batch_pages:
+            batches.append([])
+            size = 0
+        batches[-1].append(job)
+        size += len(job[1])
+
+    done = 0
+    if workers == 1 or len(batches) <= 1:
+        # Spawning workers would cost more than it saves
+        with ReaderPool() as readers:
+            for output_path, job_pages in jobs:
+
+                def report(job_done: int, _: int) -> None:
+                    if progress:
+                        progress(done + job_done, len(pages))
+
+                merge_pages(
+                    job_pages,
+                    output_path,
+                    readers,
+                    memory_limit,
+                    report,
+                    deduplicate=deduplicate,
+                    incremental=False,
+                )
+                done += len(job_pages)
+        return
+
+    with CancelablePool(min(workers, len(batches))) as pool:
+        futures = [
+            pool.submit(_export_batch, batch, memory_limit, deduplicate)
+            for batch in batches
+        ]
+        for future in as_completed(futures):
+            done += future.result()
+            if progress:
+                progress(done, len(pages))
+
+
+def _export_batch(
+    batch: list[ExportJob], memory_limit: Optional[int], deduplicate: bool
+) -> int:
+    global _worker_readers
+    if _worker_readers is None:
+        _worker_readers = ReaderPool()
+    elif len(_worker_readers) > MAX_WORKER_READERS:
+        _worker_readers.close()
+
+    def check_canceled(done: int, total: int) -> None:
+        # The output being written is removed again, like any canceled merge
+        if worker_canceled():
+            raise MergeCanceled()
+
+    for output_path, pages in batch:
+        merge_pages(
+            pages,
+            output_path,
+            _worker_readers,
+            memory_limit,
+            check_canceled,
+            deduplicate=deduplicate,
+            incremental=False,
+        )
+    return sum(len(pages) for _, pages in batch)
@@ -0,0 +1,396 @@
+import hashlib
+import os
+from collections import deque
+from io import BytesIO
+from typing import BinaryIO, Optional
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject,
+    ByteStringObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    PdfObject,
+    StreamObject,
+    TextStringObject,
+)
+
+import instrumentation
+from output_profiles import DEFAULT_MEMORY_LIMIT
+
+# Page keys that point back into the source document's page tree
+_PAGE_EXCLUDED_KEYS = ("/Parent", "/StructParents", "/B")
+# Objects that belong to one place in the document and must never be shared
+_UNSHAREABLE_TYPES = ("/Page", "/Pages", "/Catalog", "/Annot")
+_UNSHAREABLE_KEYS = ("/Rect", "/P", "/Parent", "/FT")
+# Deeper reference chains are copied as usual instead of deduplicated
+_MAX_SHARED_DEPTH = 64
+
+_SourceRef = tuple[int, int, int]
+
+
+# Copies each page and the source objects it references straight to the
+# output, so memory use does not grow with the size of the merged document.
+# With deduplicate, objects are written children first and identical copies,
+# such as the same font or logo from several files, are only written once.
+class StreamingPdfWriter:
+    def __init__(
+        self,
+        stream: BinaryIO,
+        memory_limit: Optional[int] = DEFAULT_MEMORY_LIMIT,
+        deduplicate: bool = False,
+    ) -> None:
+        self.memory_limit = memory_limit
+        self.deduplicate = deduplicate
+        self._stream = stream
+        self._position = 0
+        # Index is the object number; object 0 is the head of the free list
+        self._offsets: list[int] = [0]
+        self._readers: dict[int, PdfReader] = {}
+        self._object_map: dict[_SourceRef, int] = {}
+        self._page_map: dict[_SourceRef, int] = {}
+        self._queue: deque[tuple[PdfReader, IndirectObject]] = deque()
+        self._page_refs: list[int] = []
+        self._cached_bytes = 0
+        self._digests: dict[bytes, int] = {}
+        self._in_progress: set[_SourceRef] = set()
+        self._start()
+
+    def _start(self) -> None:
+        self._pages_num = self._reserve()
+        self._pages_generation = 0
+        self._catalog_num = self._reserve()
+        self._write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes) -> None:
+        self._stream.write(data)
+        self._position += len(data)
+
+    def _reserve(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets) - 1
+
+    @staticmethod
+    def _source_ref(reader: PdfReader, ref: IndirectObject) -> _SourceRef:
+        return id(reader), ref.idnum, ref.generation
+
+    def reserve_page(self, reader: PdfReader, page_num: int) -> None:
+        # Reserving every output page up front lets links between them survive
+        ref = reader.pages[page_num].indirect_reference
+        if ref is None:
+            return
+        self._readers[id(reader)] = reader
+        source_ref = self._source_ref(reader, ref)
+        if source_ref not in self._page_map:
+            self._page_map[source_ref] = self._reserve()
+
+    def add_page(self, reader: PdfReader, page_num: int) -> None:
+        self._readers[id(reader)] = reader
+        page = reader.pages[page_num]
+        ref = page.indirect_reference
+
+        num: Optional[int] = None
+        if ref is not None:
+            source_ref = self._source_ref(reader, ref)
+            num = self._page_map.get(source_ref)
+            if num is None or num in self._page_refs:
+                # A page used twice must still be two distinct page objects
+                num = self._reserve()
+                if source_ref not in self._page_map:
+                    self._page_map[source_ref] = num
+        if num is None:
+            num = self._reserve()
+
+        self._write_object(num, self._copy_page(reader, page))
+        self._page_refs.append(num)
+
+        while self._queue:
+            source_reader, source_ref = self._queue.popleft()
+            obj = source_ref.get_object()
+            target = self._object_map[self._source_ref(source_reader, source_ref)]
+            self._write_object(
+                target, NullObject() if obj is None else self._remap(source_reader, obj)
+            )
+
+        if self.memory_limit is not None and self._cached_bytes > self.memory_limit:
+            self._release_cached_objects()
+
+    def _copy_page(self, reader: PdfReader, page: DictionaryObject) -> DictionaryObject:
+        page_dict = DictionaryObject()
+        for key, value in page.items():
+            if key not in _PAGE_EXCLUDED_KEYS:
+                page_dict[NameObject(key)] = self._remap(reader, value)
+        page_dict[NameObject("/Parent")] = IndirectObject(
+            self._pages_num, self._pages_generation, None
+        )
+        return page_dict
+
+    def _map_reference(self, reader: PdfReader, ref: IndirectObject) -> PdfObject:
+        source_ref = self._source_ref(reader, ref)
+        num = self._object_map.get(source_ref)
+        if num is not None:
+            return IndirectObject(num, 0, None)
+
+        page_num = self._page_map.get(source_ref)
+        if page_num is not None:
+            return IndirectObject(page_num, 0, None)
+
+        if source_ref in self._in_progress:
+            # A reference cycle; the object keeps this number and is not shared
+            num = self._reserve()
+            self._object_map[source_ref] = num
+            return IndirectObject(num, 0, None)
+
+        obj = ref.get_object()
+        if isinstance(obj, DictionaryObject) and obj.get("/Type") in (
+            "/Page",
+            "/Pages",
+            "/Catalog",
+        ):
+            # Never drag in pages, page trees or catalogs that are not merged
+            return NullObject()
+
+        if self.deduplicate and len(self._in_progress) < _MAX_SHARED_DEPTH:
+            return IndirectObject(self._write_shared(reader, source_ref, obj), 0, None)
+
+        num = self._reserve()
+        self._object_map[source_ref] = num
+        self._queue.append((reader, ref))
+        return IndirectObject(num, 0, None)
+
+    def _write_shared(
+        self, reader: PdfReader, source_ref: _SourceRef, obj: Optional[PdfObject]
+    ) -> int:
+        # Children are written first, so equal objects serialize to equal bytes
+        self._in_progress.add(source_ref)
+        try:
+            body = self._serialize(
+                NullObject() if obj is None else self._remap(reader, obj)
+            )
+        finally:
+            self._in_progress.discard(source_ref)
+
+        num = self._object_map.get(source_ref)
+        if num is not None:
+            # Numbered early because something below referred back to it
+            self._write_body(num, body)
+            return num
+
+        digest = None
+        if _is_shareable(obj):
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            num = self._digests.get(digest)
+            if num is not None:
+                self._object_map[source_ref] = num
+                instrumentation.count("merge.deduplicated_objects")
+                instrumentation.count("merge.deduplicated_bytes", len(body))
+                return num
+
+        num = self._reserve()
+        self._object_map[source_ref] = num
+        self._write_body(num, body)
+        if digest is not None:
+            self._digests[digest] = num
+        return num
+
+    def _remap(self, reader: PdfReader, obj: PdfObject) -> PdfObject:
+        if isinstance(obj, IndirectObject):
+            return self._map_reference(reader, obj)
+        if isinstance(obj, StreamObject):
+            stream = type(obj)()
+            stream._data = obj._data
+            for key, value in obj.items():
+                if key != "/Length":
+                    stream[NameObject(key)] = self._remap(reader, value)
+            return stream
+        if isinstance(obj, DictionaryObject):
+            result = DictionaryObject()
+            for key, value in obj.items():
+                result[NameObject(key)] = self._remap(reader, value)
+            return result
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._remap(reader, value) for value in obj)
+        return obj
+
+    def _serialize(self, obj: PdfObject) -> bytes:
+        buffer = BytesIO()
+        obj.write_to_stream(buffer, None)
+        return buffer.getvalue()
+
+    def _write_object(self, num: int, obj: PdfObject) -> None:
+        self._write_body(num, self._serialize(obj))
+
+    def _write_body(self, num: int, body: bytes, generation: int = 0) -> None:
+        self._offsets[num] = self._position
+        self._write(b"%d %d obj\n" % (num, generation))
+        self._write(body)
+        self._write(b"\nendobj\n")
+        self._cached_bytes += len(body)
+
+    def _release_cached_objects(self) -> None:
+        # Everything written so far is addressed by number, so the parsed
+        # source objects can be dropped and re-read if referenced again
+        for reader in self._readers.values():
+            reader.resolved_objects.clear()
+        self._cached_bytes = 0
+
+    def close(self) -> None:
+        kids = ArrayObject(IndirectObject(num, 0, None) for num in self._page_refs)
+        pages = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Pages"),
+                NameObject("/Kids"): kids,
+                NameObject("/Count"): NumberObject(len(self._page_refs)),
+            }
+        )
+        self._write_object(self._pages_num, pages)
+        catalog = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Catalog"),
+                NameObject("/Pages"): IndirectObject(self._pages_num, 0, None),
+            }
+        )
+        self._write_object(self._catalog_num, catalog)
+
+        # Reserved numbers that were never written become free entries
+        free = [num for num, offset in enumerate(self._offsets) if not offset]
+        next_free = dict(zip(free, free[1:] + [0]))
+        xref_offset = self._position
+        lines = [b"xref\n0 %d\n" % len(self._offsets)]
+        for num, offset in enumerate(self._offsets):
+            if num in next_free:
+                lines.append(b"%010d 65535 f \n" % next_free[num])
+            else:
+                lines.append(b"%010d 00000 n \n" % offset)
+        self._write(b"".join(lines))
+
+        file_id = os.urandom(16).hex().encode()
+        self._write(
+            b"trailer\n<<\n/Size %d\n/Root %d 0 R\n/ID [<%s> <%s>]\n>>\n"
+            % (len(self._offsets), self._catalog_num, file_id, file_id)
+        )
+        self._write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+
+
+# Appends pages to an existing PDF as an incremental update. The original
+# bytes stay untouched; only the new pages, the objects they need and a new
+# version of the root page tree node are written after them.
+class IncrementalPdfWriter(StreamingPdfWriter):
+    def __init__(
+        self,
+        stream: BinaryIO,
+        base: PdfReader,
+        base_length: int,
+        base_startxref: int,
+        memory_limit: Optional[int] = DEFAULT_MEMORY_LIMIT,
+        deduplicate: bool = False,
+    ) -> None:
+        self._base = base
+        self._base_length = base_length
+        self._base_startxref = base_startxref
+        super().__init__(stream, memory_limit, deduplicate)
+
+    def _start(self) -> None:
+        trailer = self._base.trailer
+        catalog_ref = trailer.raw_get("/Root")
+        pages_ref = catalog_ref.get_object().raw_get("/Pages")
+        self._catalog_num = catalog_ref.idnum
+        self._pages_num = pages_ref.idnum
+        self._pages_generation = pages_ref.generation
+        self._root_pages = pages_ref.get_object()
+
+        # New objects are numbered after everything the original file uses
+        used = [num for section in self._base.xref.values() for num in section]
+        used.extend(self._base.xref_objStm)
+        self._offsets = [0] * max(trailer.get("/Size", 0), max(used, default=0) + 1)
+        self._position = self._base_length
+        # The original is not guaranteed to end with a line break
+        self._write(b"\n")
+
+    def _map_reference(self, reader: PdfReader, ref: IndirectObject) -> PdfObject:
+        if reader is self._base:
+            # Objects already in the file are referred to, never copied
+            return IndirectObject(ref.idnum, ref.generation, None)
+        return super()._map_reference(reader, ref)
+
+    def _copy_page(self, reader: PdfReader, page: DictionaryObject) -> DictionaryObject:
+        page_dict = super()._copy_page(reader, page)
+        # Without explicit values, new pages would inherit these from the root
+        defaults = {
+            "/Resources": DictionaryObject(),
+            "/MediaBox": ArrayObject(NumberObject(n) for n in (0, 0, 612, 792)),
+            "/Rotate": NumberObject(0),
+        }
+        defaults["/CropBox"] = page_dict.get("/MediaBox", defaults["/MediaBox"])
+        for key, default in defaults.items():
+            if key in self._root_pages and key not in page_dict:
+                page_dict[NameObject(key)] = default
+        return page_dict
+
+    def close(self) -> None:
+        pages = DictionaryObject()
+        for key, value in self._root_pages.items():
+            pages[NameObject(key)] = value
+        pages[NameObject("/Kids")] = ArrayObject(
+            [
+                *self._root_pages["/Kids"],
+                *(IndirectObject(num, 0, None) for num in self._page_refs),
+            ]
+        )
+        pages[NameObject("/Count")] = NumberObject(
+            self._root_pages["/Count"] + len(self._page_refs)
+        )
+        self._write_body(
+            self._pages_num, self._serialize(pages), self._pages_generation
+        )
+
+        # Only changed and new objects are listed, in runs of consecutive numbers.
+        # Readers such as PyPDF2 expect the table to start at object 0.
+        written = [0] + [num for num, offset in enumerate(self._offsets) if offset]
+        xref_offset = self._position
+        lines = [b"xref\n"]
+        start = 0
+        while start < len(written):
+            end = start
+            while end + 1 < len(written) and written[end + 1] == written[end] + 1:
+                end += 1
+            lines.append(b"%d %d\n" % (written[start], end - start + 1))
+            for num in written[start : end + 1]:
+                if num == 0:
+                    lines.append(b"0000000000 65535 f \n")
+                    continue
+                generation = self._pages_generation if num == self._pages_num else 0
+                lines.append(b"%010d %05d n \n" % (self._offsets[num], generation))
+            start = end + 1
+        self._write(b"".join(lines))
+
+        trailer = DictionaryObject(
+            {
+                NameObject("/Size"): NumberObject(len(self._offsets)),
+                NameObject("/Root"): self._base.trailer.raw_get("/Root"),
+                NameObject("/Prev"): NumberObject(self._base_startxref),
+            }
+        )
+        if "/Info" in self._base.trailer:
+            trailer[NameObject("/Info")] = self._base.trailer.raw_get("/Info")
+        # The first ID identifies the document and stays; the second changes
+        new_id = ByteStringObject(os.urandom(16))
+        base_id = self._base.trailer.get("/ID")
+        first_id = base_id[0] if base_id else new_id
+        if isinstance(first_id, TextStringObject):
+            # PyPDF2 may have decoded the ID as text; keep its exact bytes
+            first_id = ByteStringObject(first_id.original_bytes)
+        trailer[NameObject("/ID")] = ArrayObject([first_id, new_id])
+        self._write(b"trailer\n" + self._serialize(trailer) + b"\n")
+        self._write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+
+
+def _is_shareable(obj: Optional[PdfObject]) -> bool:
+    if isinstance(obj, DictionaryObject):
+        if obj.get("/Type") in _UNSHAREABLE_TYPES:
+            return False
+        return not any(key in obj for key in _UNSHAREABLE_KEYS)
+    return True
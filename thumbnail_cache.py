@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import instrumentation
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Bumped whenever the stored format changes; older caches are dropped
+SCHEMA_VERSION = 2
+
+# Width, height and packed RGB samples of a rendered page
+Thumbnail = tuple[int, int, bytes]
+# Fingerprint, page number, size and the thumbnail stored for them
+CacheEntry = tuple[str, int, int, Thumbnail]
+
+
+def file_fingerprint(file_path: str) -> str:
+    stat = os.stat(file_path)
+    key = f"{os.path.realpath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+class ThumbnailCache:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._closed = False
+        self._db = sqlite3.connect(
+            os.path.join(directory, "thumbnails.sqlite3"), check_same_thread=False
+        )
+        # Cache writes are disposable, so skip the fsync on every commit
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS thumbnails")
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS thumbnails ("
+            "fingerprint TEXT, page INTEGER, size INTEGER, width INTEGER, "
+            "height INTEGER, data BLOB, last_access REAL, "
+            "PRIMARY KEY (fingerprint, page, size))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS thumbnails_lru ON thumbnails (last_access)"
+        )
+        self._db.commit()
+        row = self._db.execute("SELECT SUM(LENGTH(data)) FROM thumbnails").fetchone()
+        self._total_bytes: int = row[0] or 0
+
+    def get(self, fingerprint: str, page_num: int, size: int) -> Optional[Thumbnail]:
+        key = (fingerprint, page_num, size)
+        with self._lock:
+            if self._closed:
+                return None
+            row = self._db.execute(
+                "SELECT width, height, data FROM thumbnails "
+                "WHERE fingerprint=? AND page=? AND size=?",
+                key,
+            ).fetchone()
+            if row is None:
+                instrumentation.count("cache.misses")
+                return None
+            instrumentation.count("cache.hits")
+            self._db.execute(
+                "UPDATE thumbnails SET last_access=? "
+                "WHERE fingerprint=? AND page=? AND size=?",
+                (time.time(), *key),
+            )
+            self._db.commit()
+        return row
+
+    def put(
+        self, fingerprint: str, page_num: int, size: int, thumbnail: Thumbnail
+    ) -> None:
+        width, height, data = thumbnail
+        with self._lock:
+            # Renders still in flight may finish after the app closed the cache
+            if self._closed:
+                return
+            old = self._db.execute(
+                "SELECT LENGTH(data) FROM thumbnails "
+                "WHERE fingerprint=? AND page=? AND size=?",
+                (fingerprint, page_num, size),
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, page_num, size, width, height, data, time.time()),
+            )
+            self._total_bytes += len(data) - (old[0] if old else 0)
+            instrumentation.count("cache.bytes_written", len(data))
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def entries(self, fingerprints: list[str]) -> list[CacheEntry]:
+        with self._lock:
+            if self._closed:
+                return []
+            rows = self._db.execute(
+                "SELECT fingerprint, page, size, width, height, data FROM thumbnails "
+                "WHERE fingerprint IN (SELECT value FROM json_each(?))",
+                (json.dumps(fingerprints),),
+            ).fetchall()
+        return [
+            (fingerprint, page_num, size, (width, height, data))
+            for fingerprint, page_num, size, width, height, data in rows
+        ]
+
+    def put_many(self, entries: list[CacheEntry]) -> None:
+        # One transaction for all; thumbnails that are already cached are kept
+        with self._lock:
+            if self._closed:
+                return
+            cached = set(
+                self._db.execute(
+                    "SELECT fingerprint, page, size FROM thumbnails "
+                    "WHERE fingerprint IN (SELECT value FROM json_each(?))",
+                    (json.dumps(sorted({entry[0] for entry in entries})),),
+                )
+            )
+            now = time.time()
+            rows = [
+                (fingerprint, page_num, size, width, height, data, now)
+                for fingerprint, page_num, size, (width, height, data) in entries
+                if (fingerprint, page_num, size) not in cached
+            ]
+            self._db.executemany(
+                "INSERT OR IGNORE INTO thumbnails VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            written = sum(len(row[5]) for row in rows)
+            self._total_bytes += written
+            instrumentation.count("cache.bytes_written", written)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        # Trim to 90% so a full cache does not evict on every insert
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute(
+            "SELECT rowid, LENGTH(data) FROM thumbnails ORDER BY last_access"
+        )
+        evicted: list[tuple[int]] = []
+        for rowid, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((rowid,))
+            self._total_bytes -= size
+        self._db.executemany("DELETE FROM thumbnails WHERE rowid=?", evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._db.execute("DELETE FROM thumbnails")
+            self._db.commit()
+            self._db.execute("VACUUM")
+            self._total_bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._db.close()
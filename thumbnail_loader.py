@@ -0,0 +1,200 @@
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from PyQt6.QtCore import QEvent, QObject, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QListView
+
+import instrumentation
+from page_model import PageListModel
+from render_pool import RenderPool
+from thumbnail_cache import Thumbnail, ThumbnailCache, file_fingerprint
+
+# Rows rendered ahead of the viewport in both directions
+PREFETCH_ROWS = 20
+
+
+class ThumbnailLoader(QObject):
+    thumbnail_ready = pyqtSignal(str, int, object)
+    thumbnail_failed = pyqtSignal(str, int, str)
+
+    def __init__(
+        self,
+        view: QListView,
+        model: PageListModel,
+        render_pool: RenderPool,
+        cache: ThumbnailCache,
+    ) -> None:
+        super().__init__(view)
+        self.view = view
+        self.model = model
+        self.render_pool = render_pool
+        self.cache = cache
+
+        self._fingerprints: dict[str, str] = {}
+        self._pending: dict[tuple[str, int], Future[Thumbnail]] = {}
+        self._visible_range = (0, -1)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(30)
+        self._timer.timeout.connect(self.update_viewport)
+        self.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self.thumbnail_failed.connect(self._on_thumbnail_failed)
+
+        scroll_bar = view.verticalScrollBar()
+        if scroll_bar:
+            scroll_bar.valueChanged.connect(self.schedule_update)
+        viewport = view.viewport()
+        if viewport:
+            viewport.installEventFilter(self)
+        model.rowsInserted.connect(self.schedule_update)
+        model.rowsRemoved.connect(self.schedule_update)
+        model.rowsMoved.connect(self.schedule_update)
+        model.modelReset.connect(self.schedule_update)
+        model.rasters.evicted.connect(self.schedule_update)
+
+    def eventFilter(self, a0: Optional[QObject], a1: Optional[QEvent]) -> bool:
+        if a1 and a1.type() in (QEvent.Type.Resize, QEvent.Type.Show):
+            self.schedule_update()
+        return False
+
+    def schedule_update(self) -> None:
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _row_bounds(self, top: int, bottom: int) -> tuple[int, int]:
+        count = self.model.rowCount()
+        if count == 0:
+            return 0, -1
+
+        # Rows are laid out top to bottom, so binary search their positions
+        lo, hi = 0, count - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.view.visualRect(self.model.index(mid)).bottom() < top:
+                lo = mid + 1
+            else:
+                hi = mid
+        first = lo
+
+        lo, hi = first, count - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.view.visualRect(self.model.index(mid)).top() > bottom:
+                hi = mid - 1
+            else:
+                lo = mid
+        return first, lo
+
+    def update_viewport(self) -> None:
+        viewport = self.view.viewport()
+        if not viewport:
+            return
+        first, last = self._row_bounds(0, viewport.height())
+        self._visible_range = (first, last)
+        count = self.model.rowCount()
+        # Thumbnails of other views are reused as long as the scale matches;
+        # the raster store's budget decides how many are kept
+        self.model.raster_scale = self.view.devicePixelRatioF()
+
+        wanted: set[tuple[str, int]] = set()
+        # Visible rows first, then the prefetch margins around them
+        rows = list(range(first, last + 1))
+        for offset in range(1, PREFETCH_ROWS + 1):
+            rows.extend((last + offset, first - offset))
+        for row in rows:
+            if not 0 <= row < count or self.model.has_thumbnail(row):
+                continue
+            key = self.model.page(row)
+            if key in self.model.render_errors:
+                continue
+            wanted.add(key)
+            self._request(key)
+
+        for key in list(self._pending):
+            if key not in wanted and self._pending[key].cancel():
+                del self._pending[key]
+
+    def _request(self, key: tuple[str, int]) -> None:
+        if key in self._pending:
+            return
+        file_path, page_num = key
+        info = self.model.document(file_path)
+        # Pages restored from elsewhere may come without an inspection result
+        fingerprint = info.fingerprint if info else self._fingerprints.get(file_path)
+        if fingerprint is None:
+            try:
+                fingerprint = file_fingerprint(file_path)
+            except OSError as e:
+                # The source was moved or deleted since the page was added
+                self._on_thumbnail_failed(file_path, page_num, str(e))
+                return
+            self._fingerprints[file_path] = fingerprint
+
+        size = self._render_size()
+        thumbnail = self.cache.get(fingerprint, page_num, size)
+        if thumbnail is not None:
+            self._on_thumbnail_ready(file_path, page_num, thumbnail)
+            return
+
+        try:
+            future = self.render_pool.submit(file_path, page_num, size)
+        except Exception as e:
+            self._on_thumbnail_failed(file_path, page_num, str(e))
+            return
+        self._pending[key] = future
+        submitted = time.perf_counter()
+
+        def done(f: Future[Thumbnail]) -> None:
+            if f.cancelled():
+                instrumentation.count("thumbnail.canceled")
+                return
+            # Includes queueing behind other renders, as the user sees it
+            instrumentation.add_time(
+                "thumbnail.render_latency", time.perf_counter() - submitted
+            )
+            error = f.exception()
+            try:
+                # Emitted from the executor thread, delivered on the GUI thread
+                if isinstance(error, BrokenProcessPool):
+                    # The pool restarts with the next render, so the page is
+                    # tried again rather than marked as broken
+                    self.thumbnail_ready.emit(file_path, page_num, None)
+                elif error is not None:
+                    self.thumbnail_failed.emit(file_path, page_num, str(error))
+                else:
+                    thumbnail = f.result()
+                    self.cache.put(fingerprint, page_num, size, thumbnail)
+                    self.thumbnail_ready.emit(file_path, page_num, thumbnail)
+            except RuntimeError:
+                pass  # The loader was deleted together with its view
+
+        future.add_done_callback(done)
+
+    def _render_size(self) -> int:
+        # Rendered at device pixels so thumbnails stay sharp on high-DPI screens
+        return round(self.model.raster_size * self.model.raster_scale)
+
+    def _on_thumbnail_ready(
+        self, file_path: str, page_num: int, thumbnail: Optional[Thumbnail]
+    ) -> None:
+        self._pending.pop((file_path, page_num), None)
+        if thumbnail is None:
+            return
+
+        self.model.rasters.put(
+            (file_path, page_num, self.model.raster_size, self.model.raster_scale),
+            thumbnail,
+        )
+        first, last = self._visible_range
+        self.model.thumbnails_changed(first - PREFETCH_ROWS, last + PREFETCH_ROWS)
+
+    def _on_thumbnail_failed(self, file_path: str, page_num: int, error: str) -> None:
+        # The page shows as crossed out and is not rendered again until the
+        # list is loaded anew
+        self._pending.pop((file_path, page_num), None)
+        self.model.render_errors[(file_path, page_num)] = error
+        first, last = self._visible_range
+        self.model.thumbnails_changed(first - PREFETCH_ROWS, last + PREFETCH_ROWS)
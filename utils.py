@@ -1,33 +1,61 @@
-import fitz
-import screeninfo
-from PyQt6.QtGui import QPixmap
-
-
-def get_pdf_thumbnail(file_path: str, page_num: int = 0) -> QPixmap:
-    doc = fitz.open(file_path)
-    try:
-        page = doc.load_page(page_num)
-        pix = page.get_pixmap(matrix=fitz.Matrix(1, 1), dpi=100)
-        img_data = pix.tobytes("jpeg")
-    finally:
-        doc.close()
-
-    pixmap = QPixmap()
-    pixmap.loadFromData(img_data, "JPEG")
+from typing import Optional
+
+from PyQt6.QtCore import QRect
+from PyQt6.QtGui import QGuiApplication, QImage, QPixmap, QScreen
+
+import instrumentation
+from thumbnail_cache import Thumbnail
+
+
+def thumbnail_pixmap(thumbnail: Thumbnail) -> QPixmap:
+    width, height, samples = thumbnail
+    with instrumentation.timer("thumbnail.to_pixmap"):
+        # Wraps the samples without copying; fromImage makes the only copy
+        image = QImage(samples, width, height, width * 3, QImage.Format.Format_RGB888)
+        pixmap = QPixmap.fromImage(image)
     return pixmap
 
 
+_screen_rect: Optional[QRect] = None
+_watching_screens = False
+
+
+def _forget_screen_geometry() -> None:
+    global _screen_rect
+    _screen_rect = None
+
+
+def _on_primary_screen_changed(screen: QScreen) -> None:
+    _forget_screen_geometry()
+    screen.geometryChanged.connect(_forget_screen_geometry)
+
+
+def _screen_geometry() -> QRect:
+    # Probed once, and again after the primary screen or its resolution changed
+    global _screen_rect, _watching_screens
+    if _screen_rect is None:
+        screen = QGuiApplication.primaryScreen()
+        if screen is None:
+            return QRect(0, 0, 1280, 800)
+        app = QGuiApplication.instance()
+        if not _watching_screens and isinstance(app, QGuiApplication):
+            app.primaryScreenChanged.connect(_on_primary_screen_changed)
+            screen.geometryChanged.connect(_forget_screen_geometry)
+            _watching_screens = True
+        _screen_rect = screen.geometry()
+    return _screen_rect
+
+
 def get_start_size() -> tuple[int, int, int, int]:
-    monitor = screeninfo.get_monitors()[0]
-    width = min(500, monitor.width)
-    height = min(800, int(0.85 * monitor.height))
-    x = max(0, monitor.x + 100)
-    y = max(0, monitor.y + 50)
+    monitor = _screen_geometry()
+    width = min(500, monitor.width())
+    height = min(800, int(0.85 * monitor.height()))
+    x = max(0, monitor.x() + 100)
+    y = max(0, monitor.y() + 50)
     return x, y, width, height
 
 
 def get_page_size() -> tuple[int, int]:
-    monitor = screeninfo.get_monitors()[0]
-    height = int(0.6 * monitor.height)
+    height = int(0.6 * _screen_geometry().height())
     width = int(0.7 * height)
     return width, height